@@ -2,15 +2,20 @@
 // awg_core.c  —  High-speed AWG GPIO core (C, libgpiod v2)
 // -------------------------------------------------------------
 // Build:
-//   gcc -O3 -fPIC -shared -o libawg_core.so awg_core.c -lgpiod
+//   gcc -O3 -fPIC -shared -o libawg_core_libgpiod.so awg_core_libgpiod.c -lgpiod
+//   (pure_python_server/awg_core.py 會在同目錄找 libawg_core_libgpiod.so，找到就走 C 路徑)
 //
 // Minimal Python usage (ctypes):
 //   import ctypes
-//   lib = ctypes.CDLL("./libawg_core.so")
+//   lib = ctypes.CDLL("./libawg_core_libgpiod.so")
 //   assert lib.awg_init() == 0
 //   lib.awg_send_hex4(b"...24hex...", b"...144hex...", b"...24hex...", b"...144hex...")
 //   lib.awg_close()
 //
+//   Pre-packed words (one ctypes call per table):
+//   words = (ctypes.c_uint32 * 33)(*table)
+//   lib.awg_send_words32_pulse(words, 33, 1, 1000)   # active-high WEN, 1 us pulse
+//
 // -------------------------------------------------------------
 // Input Format (FOUR HEX STRINGS, fixed length):
 //   1) idxA_hex  : 24 hex chars  (3 hex per tone * 8 tones)
@@ -48,6 +53,7 @@
 #include <string.h>
 #include <stdio.h>
 #include <time.h>
+#include <errno.h>
 #include <gpiod.h>
 
 // ------------------ Tunables ------------------
@@ -78,6 +84,25 @@ static inline void busy_wait_us(unsigned us) {
     nanosleep(&ts, NULL);
 }
 
+// 短脈寬（< SPIN_NS）用 CLOCK_MONOTONIC 自旋；較長的用 clock_nanosleep 絕對時間
+#define SPIN_NS 100000u
+
+static inline void wait_ns(unsigned ns) {
+    if (ns == 0) return;
+    struct timespec t;
+    clock_gettime(CLOCK_MONOTONIC, &t);
+    t.tv_nsec += (long)ns;
+    while (t.tv_nsec >= 1000000000L) { t.tv_sec++; t.tv_nsec -= 1000000000L; }
+    if (ns < SPIN_NS) {
+        struct timespec now;
+        do {
+            clock_gettime(CLOCK_MONOTONIC, &now);
+        } while (now.tv_sec < t.tv_sec || (now.tv_sec == t.tv_sec && now.tv_nsec < t.tv_nsec));
+        return;
+    }
+    while (clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, &t, NULL) == EINTR) { }
+}
+
 static inline void map_word_to_values(uint32_t w, enum gpiod_line_value *vals32) {
     for (int i = 0; i < 32; ++i)
         vals32[i] = (w & (1u << i)) ? GPIOD_LINE_VALUE_ACTIVE
@@ -133,6 +158,16 @@ static inline void wen_edge(int active_high, int pulse_us) {
     gpiod_line_request_set_value(g_wen_req, DEF_WEN_OFF, off); 
 }
 
+static inline void wen_edge_ns(int active_high, unsigned pulse_ns) {
+    enum gpiod_line_value on  = active_high ? GPIOD_LINE_VALUE_ACTIVE
+                                            : GPIOD_LINE_VALUE_INACTIVE;
+    enum gpiod_line_value off = active_high ? GPIOD_LINE_VALUE_INACTIVE
+                                            : GPIOD_LINE_VALUE_ACTIVE;
+    gpiod_line_request_set_value(g_wen_req, DEF_WEN_OFF, on);
+    wait_ns(pulse_ns);
+    gpiod_line_request_set_value(g_wen_req, DEF_WEN_OFF, off);
+}
+
 // ------------------ Public API ------------------
 int awg_init(void)
 {
@@ -239,4 +274,31 @@ int awg_send_hex4(const char *idxA_hex, const char *gainA_hex,
     wen_edge(DEF_WEN_ACTHI, DEF_WEN_US);
 
     return 0;
-}
\ No newline at end of file
+}
+
+// Flexible version: stream exactly "count" words (caller decides commit)
+int awg_send_words32(const uint32_t *words32, int count)
+{
+    if (!g_data_req || !g_wen_req) return -1;
+    if (!words32 || count <= 0) return -2;
+
+    for (int i = 0; i < count; ++i) {
+        write_word32(words32[i]);
+        wen_edge(DEF_WEN_ACTHI, DEF_WEN_US);
+    }
+    return 0;
+}
+
+// Same as awg_send_words32, with WEN polarity and pulse width (ns) chosen per call
+int awg_send_words32_pulse(const uint32_t *words32, int count,
+                           int wen_acthi, unsigned pulse_ns)
+{
+    if (!g_data_req || !g_wen_req) return -1;
+    if (!words32 || count <= 0) return -2;
+
+    for (int i = 0; i < count; ++i) {
+        write_word32(words32[i]);
+        wen_edge_ns(wen_acthi, pulse_ns);
+    }
+    return 0;
+}
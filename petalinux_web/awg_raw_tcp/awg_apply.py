@@ -50,6 +50,20 @@ def make_gain_word(ch, tone, gain20):
 def make_commit_word():
     return (0xF << 28)
 
+# 每個 (cmd, ch, tone) 的高 12 bits 固定 → 預先算好 8 個 header，送表時只剩 OR payload
+_HDR_IDX_A  = [make_index_word(0, t, 0) for t in range(8)]
+_HDR_GAIN_A = [make_gain_word (0, t, 0) for t in range(8)]
+_HDR_IDX_B  = [make_index_word(1, t, 0) for t in range(8)]
+_HDR_GAIN_B = [make_gain_word (1, t, 0) for t in range(8)]
+
+def build_words(idxA, gainA, idxB, gainB):
+    """A:INDEX 0..7, A:GAIN 0..7, B:INDEX 0..7, B:GAIN 0..7, COMMIT（共 33 個 word）"""
+    return ([h | (v & 0xFFFFF) for h, v in zip(_HDR_IDX_A,  idxA)] +
+            [h | (v & 0xFFFFF) for h, v in zip(_HDR_GAIN_A, gainA)] +
+            [h | (v & 0xFFFFF) for h, v in zip(_HDR_IDX_B,  idxB)] +
+            [h | (v & 0xFFFFF) for h, v in zip(_HDR_GAIN_B, gainB)] +
+            [make_commit_word()])
+
 # ---------- 解析工具 ----------
 def _read_form():
     method = os.environ.get("REQUEST_METHOD","GET").upper()
@@ -65,17 +79,15 @@ def _read_form():
     return {k: (v[0] if v else "") for k,v in q.items()}
 
 def _to_int_list(s, n=8, default=0):
-    """支援 '1,2,0x10' 混合，回傳長度 n 的 list。"""
+    """支援 '1,2,0x10' 混合，回傳長度 n 的 list；格式不對的 token 丟 ValueError。"""
     out = []
     if s:
         for tok in s.split(','):
             tok = tok.strip()
-            if not tok:
-                continue
-            base = 16 if tok.lower().startswith("0x") else 10
-            out.append(int(tok, base))
-    while len(out) < n:
-        out.append(default)
+            if tok:
+                out.append(int(tok, 16 if tok[:2].lower() == "0x" else 10))
+    if len(out) < n:
+        out += [default] * (n - len(out))
     return out[:n]
 
 def _to_float_list(s, n=8, default=0.0):
@@ -90,13 +102,28 @@ def _to_float_list(s, n=8, default=0.0):
         out.append(default)
     return out[:n]
 
-def _gain_f_to_q17(f):
-    # 0..1 -> Q1.17 (20-bit, 0x00000..0x1FFFF)
-    if f < 0.0: f = 0.0
-    if f > 1.0: f = 1.0
-    return int(f * 0x1FFFF + 0.5)
+def _gains_f_to_q17(fs):
+    # 0..1 -> Q1.17 (20-bit, 0x00000..0x1FFFF)；先把 float 夾在 [0, 1] 再換算（±inf 也不會溢位）
+    return [int((0.0 if f < 0.0 else 1.0 if f > 1.0 else f) * 0x1FFFF + 0.5) for f in fs]
 
 # ---------- GPIO：建立 requests ----------
+# 常駐 handle：同一個 process 內（FastCGI / 長駐 worker / 被 import）重複使用，
+# 不再每次送表都 open + request 32 條線再 release。純 CGI 每次 fork 仍會重開一次。
+_data_reqs = {}   # chip_path -> LineRequest
+_wen_reqs  = {}   # (chip_path, offset) -> LineRequest
+
+def get_data_request(chip_path):
+    req = _data_reqs.get(chip_path)
+    if req is None:
+        req = _data_reqs[chip_path] = open_data_request(chip_path)
+    return req
+
+def get_wen_request(chip_path, off):
+    req = _wen_reqs.get((chip_path, off))
+    if req is None:
+        req = _wen_reqs[(chip_path, off)] = open_wen_request(chip_path, off)
+    return req
+
 def open_data_request(chip_path):
     # 32 bit lines: offset 0..31 都當輸出
     cfg = LineSettings(direction=Direction.OUTPUT, output_value=Value.INACTIVE)
@@ -108,67 +135,49 @@ def open_wen_request(chip_path, off, active_high=True):
     cfg = LineSettings(direction=Direction.OUTPUT, output_value=init)
     return gpiod.request_lines(chip_path, consumer="awg_wen", config={off: cfg})
 
+# ---------- 精準延遲 ----------
+SPIN_NS  = 100_000   # 100 us 以下：純 busy-spin
+SLACK_NS = 50_000    # 較長延遲：先 sleep 到 deadline 前 50 us，再 spin 收尾
+
+def precise_sleep(ns):
+    # time.sleep 受排程粒度限制（非 RT 核心常有 >=50 us 誤差），尾段改用 monotonic_ns 自旋
+    deadline = time.monotonic_ns() + ns
+    if ns > SPIN_NS:
+        time.sleep((ns - SLACK_NS) / 1_000_000_000.0)
+    while time.monotonic_ns() < deadline:
+        pass
+
 def wen_pulse(wen_req, off, active_high=True, pulse_us=100):
     on  = Value.ACTIVE if active_high else Value.INACTIVE
     offv= Value.INACTIVE if active_high else Value.ACTIVE
     wen_req.set_values({off: on})
-    # 注意 Python sleep 精度有限，對 WEN 通常數十 us~ms 都可接受
-    time.sleep(pulse_us / 1_000_000.0)
+    if pulse_us > 0:
+        precise_sleep(pulse_us * 1_000)
     wen_req.set_values({off: offv})
 
+# 32-bit word 拆位用：(offset, mask) 常數表 + 常駐 {offset: Value}
+_ACTIVE, _INACTIVE = Value.ACTIVE, Value.INACTIVE
+_BITS = [(i, 1 << i) for i in range(32)]
+_vmap = {i: _INACTIVE for i in range(32)}
+
 def write_word(data_req, word):
-    # 將 32-bit word 拆成 {offset: Value}
-    m = {}
-    for i in range(32):
-        bit = (word >> i) & 1
-        m[i] = Value.ACTIVE if bit else Value.INACTIVE
-    data_req.set_values(m)
+    # 將 32-bit word 原地寫進 _vmap（不每次新建 dict），一次 set_values 送出
+    for i, b in _BITS:
+        _vmap[i] = _ACTIVE if (word & b) else _INACTIVE
+    data_req.set_values(_vmap)
 
 # ---------- 主流程：送表 ----------
 def send_awg_table(data_chip, wen_chip, wen_off, wen_acthi, wen_us,
                    idxA, gainA, idxB, gainB):
-    data_req = open_data_request(data_chip)
-    wen_req  = open_wen_request(wen_chip, wen_off, active_high=wen_acthi)
-
-    words = []
+    data_req = get_data_request(data_chip)
+    wen_req  = get_wen_request(wen_chip, wen_off)
 
-    # A: INDEX 0..7
-    for t in range(8):
-        w = make_index_word(0, t, idxA[t])
-        words.append(w)
+    words = build_words(idxA, gainA, idxB, gainB)
+    for w in words:
         write_word(data_req, w)
         wen_pulse(wen_req, wen_off, wen_acthi, wen_us)
 
-    # A: GAIN 0..7
-    for t in range(8):
-        w = make_gain_word(0, t, gainA[t])
-        words.append(w)
-        write_word(data_req, w)
-        wen_pulse(wen_req, wen_off, wen_acthi, wen_us)
-
-    # B: INDEX 0..7
-    for t in range(8):
-        w = make_index_word(1, t, idxB[t])
-        words.append(w)
-        write_word(data_req, w)
-        wen_pulse(wen_req, wen_off, wen_acthi, wen_us)
-
-    # B: GAIN 0..7
-    for t in range(8):
-        w = make_gain_word(1, t, gainB[t])
-        words.append(w)
-        write_word(data_req, w)
-        wen_pulse(wen_req, wen_off, wen_acthi, wen_us)
-
-    # COMMIT
-    w = make_commit_word()
-    words.append(w)
-    write_word(data_req, w)
-    wen_pulse(wen_req, wen_off, wen_acthi, wen_us)
-
-    # 保持輸出狀態即可；若要釋放：
-    data_req.release()
-    wen_req.release()
+    # 保持輸出狀態，handle 留給下一次送表（process 結束時由 kernel 釋放）
     return words
 
 # ---------- CGI main ----------
@@ -192,8 +201,8 @@ def main():
         if "gainA_f" in form or "gainB_f" in form:
             gainA_f = _to_float_list(form.get("gainA_f"), 8, 0.0)
             gainB_f = _to_float_list(form.get("gainB_f"), 8, 0.0)
-            gainA = [_gain_f_to_q17(x) for x in gainA_f]
-            gainB = [_gain_f_to_q17(x) for x in gainB_f]
+            gainA = _gains_f_to_q17(gainA_f)
+            gainB = _gains_f_to_q17(gainB_f)
         else:
             gainA = _to_int_list(form.get("gainA"), 8, 0)
             gainB = _to_int_list(form.get("gainB"), 8, 0)
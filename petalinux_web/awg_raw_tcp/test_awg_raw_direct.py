@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import socket, struct, time
+from functools import lru_cache
 
 HOST = "wavegenz7.local"     # 先可改成 "172.31.25.3" 測試
 PORT = 9000
@@ -15,11 +16,19 @@ def make_index_word(ch, tone, idx20): return pack_word(0x1, ch, tone, idx20)
 def make_gain_word (ch, tone, g20):   return pack_word(0x2, ch, tone, g20)
 def make_commit_word():                return (0xF << 28)
 
+# 兩種 frame 都是常數 → 模組載入時算一次
+FRAME_1K  = (make_index_word(CH_A, TONE_0, IDX_1K),  make_gain_word(CH_A, TONE_0, GAIN_MAX), make_commit_word())
+FRAME_20K = (make_index_word(CH_A, TONE_0, IDX_20K), make_gain_word(CH_A, TONE_0, GAIN_MAX), make_commit_word())
+
+@lru_cache(maxsize=None)
+def _frame_struct(n: int) -> struct.Struct:
+    # count(H) + words(N*I)；每種長度只編譯一次格式字串
+    return struct.Struct(">H%dI" % n)
+
 def send_frame(sock, words):
-    count = len(words)
-    hdr = struct.pack(">H", count)
-    payload = b"".join(struct.pack(">I", w & 0xFFFFFFFF) for w in words)
-    sock.sendall(hdr + payload)
+    # count(H) + words(N*I) 一次 pack 完成
+    n = len(words)
+    sock.sendall(_frame_struct(n).pack(n, *words))
 
 def connect_with_timeout(host, port, timeout=3.0):
     # 解析並印出
@@ -40,21 +49,10 @@ def main():
         sock = connect_with_timeout(HOST, PORT, timeout=3.0)
         print("[W-CLIENT] connected")
 
+        frames = (FRAME_1K, FRAME_20K)
         toggle = 0
         while True:
-            if toggle == 0:
-                words = [
-                    make_index_word(CH_A, TONE_0, IDX_1K),
-                    make_gain_word (CH_A, TONE_0, GAIN_MAX),
-                    make_commit_word(),
-                ]
-            else:
-                words = [
-                    make_index_word(CH_A, TONE_0, IDX_20K),
-                    make_gain_word (CH_A, TONE_0, GAIN_MAX),
-                    make_commit_word(),
-                ]
-            send_frame(sock, words)
+            send_frame(sock, frames[toggle])
             toggle ^= 1
             if GAP_MS > 0:
                 time.sleep(GAP_MS/1000.0)
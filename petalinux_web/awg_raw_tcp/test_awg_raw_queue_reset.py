@@ -7,14 +7,78 @@ Minimal AWG client for sending only the 'Z' (Reset) command.
 - Disconnects.
 """
 
+import os
 import socket
+import stat
 import struct
+import tempfile
 import time
 
 # ---------- Connection settings ----------
 HOST = "wavegenz7.local"  # Or use an IP address like "192.168.1.10"
 CONTROL_PORT = 9100
 CONNECT_TIMEOUT = 3.0
+RESOLVE_TTL = 60  # seconds to trust a cached hostname -> IP lookup
+
+# --- Hostname resolution cache ---
+def _resolve_cache_dir() -> str:
+    """
+    Prefer /run (tmpfs, cleared on reboot); fall back to the temp dir if not writable.
+    The directory is per user (awg_resolve-<uid>, mode 0700) and is only used if it is
+    a real directory owned by us that nobody else can write, so another local user
+    cannot plant a cached IP.
+    """
+    uid = os.getuid()
+    for base in ("/run", tempfile.gettempdir()):
+        d = os.path.join(base, f"awg_resolve-{uid}")
+        try:
+            os.makedirs(d, mode=0o700, exist_ok=True)
+            st = os.lstat(d)
+            if (stat.S_ISDIR(st.st_mode) and st.st_uid == uid
+                    and not st.st_mode & 0o077):
+                return d
+        except OSError:
+            continue
+    return ""
+
+def _resolve_cached(host: str, ttl=RESOLVE_TTL) -> str:
+    """
+    Resolve host via a small file cache so repeated runs skip the mDNS round-trip.
+    The file's mtime is the lookup time; entries older than ttl are refreshed.
+    """
+    d = _resolve_cache_dir()
+    path = os.path.join(d, host) if d else ""
+    if path:
+        try:
+            st = os.lstat(path)
+            if (stat.S_ISREG(st.st_mode) and st.st_uid == os.getuid()
+                    and time.time() - st.st_mtime < ttl):
+                with open(path) as f:
+                    ip = f.read().strip()
+                if ip:
+                    return ip
+        except OSError:
+            pass
+
+    ip = socket.gethostbyname(host)
+    if path:
+        try:
+            tmp = f"{path}.{os.getpid()}"
+            with open(tmp, "w") as f:
+                f.write(ip)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+    return ip
+
+def _forget_cached(host: str):
+    """Drop a cached lookup (e.g. the board got a new IP and connect failed)."""
+    d = _resolve_cache_dir()
+    if d:
+        try:
+            os.remove(os.path.join(d, host))
+        except OSError:
+            pass
 
 # --- Socket and Protocol Operation Helpers ---
 def connect_socket(ip: str, port: int, timeout=CONNECT_TIMEOUT) -> socket.socket:
@@ -38,7 +102,7 @@ def main():
     try:
         # Resolve hostname to IP address
         print(f"[CLIENT] Resolving {HOST}...")
-        ip = socket.gethostbyname(HOST)
+        ip = _resolve_cached(HOST)
         print(f"[CLIENT] Resolved to IP: {ip}")
 
         # Connect to the control channel
@@ -51,8 +115,10 @@ def main():
         print("[CLIENT] Reset operation complete.")
 
     except socket.timeout:
+        _forget_cached(HOST)
         print(f"[ERROR] Connection timed out after {CONNECT_TIMEOUT} seconds.")
     except socket.error as e:
+        _forget_cached(HOST)
         print(f"[ERROR] Socket error: {e}. Check server status and network connection.")
     except Exception as e:
         print(f"[ERROR] An unexpected error occurred: {e}")
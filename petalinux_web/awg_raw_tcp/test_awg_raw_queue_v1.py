@@ -4,17 +4,21 @@
 Queue-mode AWG client (with mDNS hostname resolve)
 - Connects to wavegenz7.local:9100 (resolve hostname -> IP)
 - Protocol ops: Z/X/I/B/P/E/T/Q/S (all big-endian)
-- Preloads list0 & list1 with 1000 frames each, auto-starts, prints status/stats.
+- Waits on the notification channel (9101) instead of sleep-polling Q
+- Preloads list0 & list1 with 10000 frames each (one prebuilt B/P*/E buffer per list),
+  auto-starts, and refills each list as soon as the server switches away from it.
 
 Run:
   python3 queue_client_mdns.py
 """
 
-import socket, struct, time
+import socket, struct, selectors
+from functools import lru_cache
 
 # ---------- Connection settings ----------
 HOST = "wavegenz7.local"     # mDNS hostname (avahi)
 PORT = 9100
+NOTIFY_PORT = 9101           # 伺服器在 list 狀態改變時推 "LIST<id>:<STATE>\n"
 CONNECT_TIMEOUT = 3.0
 SO_SNDBUF = 256 * 1024
 
@@ -56,62 +60,104 @@ def connect_with_mdns(host=HOST, port=PORT, timeout=CONNECT_TIMEOUT) -> socket.s
     s.settimeout(None)  # 後續用 blocking I/O
     return s
 
+def connect_notify(ip: str, port=NOTIFY_PORT, timeout=CONNECT_TIMEOUT):
+    """連上通知通道，只當喚醒來源用；連不上回傳 None（退回純 Q 輪詢）"""
+    try:
+        n = socket.create_connection((ip, port), timeout=timeout)
+    except OSError as e:
+        print(f"[CLIENT] notify channel unavailable ({e}); polling with Q only")
+        return None
+    n.setblocking(False)
+    return n
+
 def sendall(s: socket.socket, data: bytes):
     s.sendall(data)
 
-def recv_exact(s: socket.socket, n: int) -> bytes:
-    buf = bytearray()
-    while len(buf) < n:
-        chunk = s.recv(n - len(buf))
-        if not chunk:
+def recv_exact(s: socket.socket, n: int) -> bytearray:
+    # 預先配置好目標 buffer，recv_into 直接寫入（無 chunk 物件、無 += 重配置、無最後 bytes() 複製）
+    buf = bytearray(n)
+    mv = memoryview(buf)
+    got = 0
+    while got < n:
+        k = s.recv_into(mv[got:], n - got)
+        if not k:
             raise ConnectionError("server closed")
-        buf += chunk
-    return bytes(buf)
+        got += k
+    return buf
 
 # ---------- Protocol ops (big-endian) ----------
+# 預先編譯好的 Struct（opcode 一起打包），避免每次呼叫重新解析格式字串
+_I_OP    = struct.Struct(">cB I")
+_B_OP    = struct.Struct(">cB I")
+_P_HDR   = struct.Struct(">cB H")
+_E_OP    = struct.Struct(">cB")
+_T_OP    = struct.Struct(">cI")
+_Q_REPLY = struct.Struct(">BBIII2x")   # playing, cur_list, cur_frame, free0, free1 + 2 bytes padding
+_S_REPLY = struct.Struct(">QQQQ")      # bytes_rx, frames_pushed, switches, holds
+
+@lru_cache(maxsize=None)
+def _words_struct(n: int) -> struct.Struct:
+    return struct.Struct(">%dI" % n)
+
 def op_Z_reset(s):     sendall(s, b'Z')
 def op_X_abort(s):     sendall(s, b'X')
 def op_I_init(s, list_id: int, max_frames_hint: int):
-    sendall(s, b'I' + struct.pack(">B I", list_id & 1, max_frames_hint))
+    sendall(s, _I_OP.pack(b'I', list_id & 1, max_frames_hint))
 def op_B_begin(s, list_id: int, total_frames: int):
-    sendall(s, b'B' + struct.pack(">B I", list_id & 1, total_frames))
+    sendall(s, _B_OP.pack(b'B', list_id & 1, total_frames))
+def sendmsg_all(s: socket.socket, bufs):
+    """scatter-gather 送出（kernel 直接收 iovec，不在 Python 端串接）；短寫時補送剩餘部分"""
+    total = sum(len(b) for b in bufs)
+    sent = s.sendmsg(bufs)
+    if sent < total:
+        s.sendall(b''.join(bufs)[sent:])
+
 def op_P_push(s, list_id: int, words):
-    payload = b''.join(struct.pack(">I", w & 0xFFFFFFFF) for w in words)
-    sendall(s, b'P' + struct.pack(">B H", list_id & 1, len(words)) + payload)
+    n = len(words)
+    sendmsg_all(s, (_P_HDR.pack(b'P', list_id & 1, n), _words_struct(n).pack(*words)))
 def op_E_end(s, list_id: int):
-    sendall(s, b'E' + struct.pack(">B", list_id & 1))
+    sendall(s, _E_OP.pack(b'E', list_id & 1))
 def op_T_period(s, period_us: int):
-    sendall(s, b'T' + struct.pack(">I", max(1, period_us)))
+    sendall(s, _T_OP.pack(b'T', max(1, period_us)))
 def op_Q_query(s):
     sendall(s, b'Q')
-    r = recv_exact(s, 16)
-    playing  = r[0]
-    cur_list = r[1]
-    cur_frame, free0, free1 = struct.unpack(">III", r[2:14])
+    playing, cur_list, cur_frame, free0, free1 = _Q_REPLY.unpack_from(recv_exact(s, 16))
     return dict(playing=playing, cur_list=cur_list, cur_frame=cur_frame, free0=free0, free1=free1)
 def op_S_stats(s):
     sendall(s, b'S')
-    r = recv_exact(s, 32)
-    a = int.from_bytes(r[ 0: 8], "big")
-    b = int.from_bytes(r[ 8:16], "big")
-    c = int.from_bytes(r[16:24], "big")
-    d = int.from_bytes(r[24:32], "big")
+    a, b, c, d = _S_REPLY.unpack_from(recv_exact(s, 32))
     return dict(bytes_rx=a, frames_pushed=b, switches=c, holds=d)
 
 # ---------- Demo frames ----------
-def frame_1k():
-    return [
-        make_index_word(CH_A, TONE_0, IDX_1K),
-        make_gain_word (CH_A, TONE_0, GAIN_FS),
-        make_commit_word(),
-    ]
-
-def frame_20k():
-    return [
-        make_index_word(CH_A, TONE_0, IDX_20K),
-        make_gain_word (CH_A, TONE_0, GAIN_FS),
-        make_commit_word(),
-    ]
+# 內容全由常數決定 → 模組載入時算一次，連序列化後的 P-op 也一起快取
+FRAME_1K = (
+    make_index_word(CH_A, TONE_0, IDX_1K),
+    make_gain_word (CH_A, TONE_0, GAIN_FS),
+    make_commit_word(),
+)
+FRAME_20K = (
+    make_index_word(CH_A, TONE_0, IDX_20K),
+    make_gain_word (CH_A, TONE_0, GAIN_FS),
+    make_commit_word(),
+)
+
+def _p_op_bytes(list_id: int, words) -> bytes:
+    return _P_HDR.pack(b'P', list_id & 1, len(words)) + _words_struct(len(words)).pack(*words)
+
+# list_id 寫在 P-op header 裡，所以 list0 / list1 各一份：_P_1K[list_id]
+_P_1K  = (_p_op_bytes(0, FRAME_1K),  _p_op_bytes(1, FRAME_1K))
+_P_20K = (_p_op_bytes(0, FRAME_20K), _p_op_bytes(1, FRAME_20K))
+
+def _alternating(list_id: int, nframes: int, even, odd) -> bytes:
+    """nframes 個 P-op，偶數幀用 even、奇數幀用 odd（傳 _P_1K / _P_20K）"""
+    a, b = even[list_id & 1], odd[list_id & 1]
+    return (a + b) * (nframes // 2) + (a if nframes & 1 else b'')
+
+def build_preload(list_id: int, nframes: int, even, odd) -> bytes:
+    """整段 B + P*nframes + E 組成一塊連續 bytes：一次 sendall、一次 syscall 迴圈送完"""
+    return (_B_OP.pack(b'B', list_id & 1, nframes)
+            + _alternating(list_id, nframes, even, odd)
+            + _E_OP.pack(b'E', list_id & 1))
 
 # ---------- Main ----------
 # ---------- Main (Looping Version) ----------
@@ -120,30 +166,36 @@ def main():
     # 根據您的設定，伺服器是在 9100 埠號
     s = connect_with_mdns(port=9100) 
     print("[CLIENT] connected")
+    s_notify = connect_notify(s.getpeername()[0])
+    sel = selectors.DefaultSelector()
+    if s_notify:
+        sel.register(s_notify, selectors.EVENT_READ)
 
     try:
         # 1. 初始設定 (Initial Setup)
         print("[CLIENT] RESET")
         op_Z_reset(s)
-        print("[CLIENT] set period = 1000 us")
-        op_T_period(s, 1000)
+        period_us = 1000
+        print(f"[CLIENT] set period = {period_us} us")
+        op_T_period(s, period_us)
+        # 沒收到通知時的保底輪詢間隔（約 8 個 frame）
+        poll_s = period_us * 8 / 1e6
 
         nframes = 10000  # 每個列表要裝載的幀數
 
+        # 預載內容固定 → 開始前就把整段 B/P*/E 組好，之後每次填裝只剩一次 sendall
+        prime_list1 = build_preload(1, nframes, _P_20K, _P_1K)
+        reload_data = (build_preload(0, nframes, _P_1K, _P_20K),
+                       build_preload(1, nframes, _P_1K, _P_20K))
+
         # 2. 初始填裝 (Initial Priming)
         #    - 先填裝好 list0，伺服器會自動開始播放它
         #    - 接著立刻填裝 list1，作為下一個播放的備用列表
         print(f"[CLIENT] Priming list0 ({nframes} frames)")
-        op_B_begin(s, 0, nframes)
-        for i in range(nframes):
-            op_P_push(s, 0, frame_1k() if (i % 2 == 0) else frame_20k())
-        op_E_end(s, 0) # 伺服器會自動開始播放 list0
+        sendall(s, reload_data[0]) # 伺服器會自動開始播放 list0
 
         print(f"[CLIENT] Priming list1 ({nframes} frames)")
-        op_B_begin(s, 1, nframes)
-        for i in range(nframes):
-            op_P_push(s, 1, frame_20k() if (i % 2 == 0) else frame_1k())
-        op_E_end(s, 1)
+        sendall(s, prime_list1)
 
         # 3. 進入主迴圈，持續監控並更新列表 (Main Loop)
         next_list_to_load = 0 # 下一次輪到 list0 需要被重新填裝
@@ -156,6 +208,18 @@ def main():
             #print(f"[*] Waiting for server to start playing list {wait_for_list}...")
             
             while True:
+                # 阻塞在 epoll 上，直到通知通道有資料（list 狀態改變）或逾時；
+                # 通知只當喚醒，實際狀態一律以 Q 回覆為準
+                for key, _ in sel.select(timeout=poll_s):
+                    try:
+                        if not key.fileobj.recv(4096):
+                            raise ConnectionError("notify closed")
+                    except BlockingIOError:
+                        pass
+                    except (ConnectionError, OSError):
+                        sel.unregister(key.fileobj)
+                        key.fileobj.close()
+                        s_notify = None
                 st = op_Q_query(s)
                 #print(f"\r[Q] playing={st['playing']} list={st['cur_list']} frame={st['cur_frame']:<5d}", end="")
                 
@@ -163,16 +227,11 @@ def main():
                 if st['cur_list'] == wait_for_list:
                     #print(f"\n[*] Server switched to list {wait_for_list}. List {next_list_to_load} is now free for preloading.")
                     break # 跳出觀察迴圈，進入填裝階段
-                
-                time.sleep(0.01) # 每 5ms 查詢一次
 
             # --- 裝填階段：為剛被清空的 list 重新填裝新的內容 ---
             #print(f"    -> Preloading list {next_list_to_load} with new data...")
-            op_B_begin(s, next_list_to_load, nframes)
-            for i in range(nframes):
-                # 這裡您可以放入新的波形資料產生邏輯
-                op_P_push(s, next_list_to_load, frame_1k() if (i % 2 == 0) else frame_20k())
-            op_E_end(s, next_list_to_load)
+            # 這裡您可以放入新的波形資料產生邏輯（逐幀送可用 op_B_begin / op_P_push / op_E_end）
+            sendall(s, reload_data[next_list_to_load])
             #print(f"    -> Preloading list {next_list_to_load} complete.")
 
             # 更新下一次要填裝的目標
@@ -185,6 +244,8 @@ def main():
     finally:
         # 無論如何，確保連線被關閉
         print("[CLIENT] Closing connection.")
+        sel.close()
+        if s_notify: s_notify.close()
         s.close()
         print("[CLIENT] Done.")
 
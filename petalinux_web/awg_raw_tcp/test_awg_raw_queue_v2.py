@@ -12,6 +12,7 @@ import struct
 import time
 import threading
 import queue
+from contextlib import contextmanager
 
 # ---------- Connection settings ----------
 HOST = "wavegenz7.local"
@@ -42,10 +43,30 @@ def connect_socket(ip: str, port: int, timeout=CONNECT_TIMEOUT) -> socket.socket
 def op_Z_reset(s): s.sendall(b'Z')
 def op_B_begin(s, list_id: int, total_frames: int): s.sendall(b'B' + struct.pack(">BI", list_id, total_frames))
 def op_P_push(s, list_id: int, words):
-    payload = b''.join(struct.pack(">I", w) for w in words)
-    s.sendall(b'P' + struct.pack(">BH", list_id, len(words)) + payload)
+    # header / payload 分兩段交給 sendmsg（iovec），不在 Python 端串接
+    n = len(words)
+    hdr = struct.pack(">cBH", b'P', list_id, n)
+    payload = struct.pack(">%dI" % n, *words)
+    sent = s.sendmsg((hdr, payload))
+    if sent < len(hdr) + len(payload):
+        s.sendall((hdr + payload)[sent:])
 def op_E_end(s, list_id: int): s.sendall(b'E' + struct.pack(">B", list_id))
 
+# TCP_NODELAY stays on for single ops; around a B/P*/E sequence, TCP_CORK holds the
+# writes in the kernel and uncorking flushes them as few full-sized segments (Linux only)
+_TCP_CORK = getattr(socket, "TCP_CORK", None)
+
+@contextmanager
+def corked(s):
+    if _TCP_CORK is None:
+        yield
+        return
+    s.setsockopt(socket.IPPROTO_TCP, _TCP_CORK, 1)
+    try:
+        yield
+    finally:
+        s.setsockopt(socket.IPPROTO_TCP, _TCP_CORK, 0)
+
 # --- [MODIFIED] Notification Listener Thread ---
 def notification_listener(host_ip: str, port: int):
     s_notify = None
@@ -54,30 +75,23 @@ def notification_listener(host_ip: str, port: int):
         s_notify.settimeout(None)
         print(f"[NOTIFY] Connected to notification server on port {port}")
         
-        buffer = b""
-        while True:
-            data = s_notify.recv(1024)
-            if not data:
-                print("\n[NOTIFY] Server closed notification channel.")
-                break
-            
-            buffer += data
-            while b'\n' in buffer:
-                message_bytes, buffer = buffer.split(b'\n', 1)
-                message = message_bytes.decode().strip()
-                if not message: continue
-
-                print(f"\n[NOTIFY] Received: {message}")
-                
-                # Parse "LIST<id>:<STATE>" message
-                if ":" in message:
-                    parts = message.split(':')
-                    if len(parts) == 2 and parts[0].startswith("LIST") and parts[1] == "IDLE":
-                        try:
-                            list_id = int(parts[0][4:])
-                            free_list_queue.put(list_id)
-                        except ValueError:
-                            print(f"[NOTIFY] Could not parse list_id from '{parts[0]}'")
+        # Line framing is done by the C BufferedReader; no Python-side accumulator/split
+        for line in s_notify.makefile('rb', buffering=4096):
+            message = line.decode().strip()
+            if not message: continue
+
+            print(f"\n[NOTIFY] Received: {message}")
+
+            # Parse "LIST<id>:<STATE>" message
+            if ":" in message:
+                parts = message.split(':')
+                if len(parts) == 2 and parts[0].startswith("LIST") and parts[1] == "IDLE":
+                    try:
+                        list_id = int(parts[0][4:])
+                        free_list_queue.put(list_id)
+                    except ValueError:
+                        print(f"[NOTIFY] Could not parse list_id from '{parts[0]}'")
+        print("\n[NOTIFY] Server closed notification channel.")
 
     except Exception as e:
         print(f"\n[NOTIFY] Error in listener: {e}")
@@ -113,15 +127,16 @@ def main():
             if free_id is None: raise ConnectionError("Notify thread died")
             
             print(f"    -> Priming list {free_id} with interleaved frames ({nframes} frames)")
-            op_B_begin(s_control, free_id, nframes)
-            
-            # Loop with an index 'i' to decide which frame to send on each iteration
-            for i in range(nframes):
-                # If i is even, send frame_A. If i is odd, send frame_B.
-                frames_to_send = frame_A() if i % 2 == 0 else frame_B()
-                op_P_push(s_control, free_id, frames_to_send)
-                
-            op_E_end(s_control, free_id)
+            with corked(s_control):
+                op_B_begin(s_control, free_id, nframes)
+
+                # Loop with an index 'i' to decide which frame to send on each iteration
+                for i in range(nframes):
+                    # If i is even, send frame_A. If i is odd, send frame_B.
+                    frames_to_send = frame_A() if i % 2 == 0 else frame_B()
+                    op_P_push(s_control, free_id, frames_to_send)
+
+                op_E_end(s_control, free_id)
         
         # --- [MODIFIED] 2. Main event-driven loop with interleaved frames ---
         print("\n[CLIENT] Entering event-driven loop... Press Ctrl+C to exit.")
@@ -134,15 +149,16 @@ def main():
                 break
 
             print(f"    -> IDLE signal for list {free_list_id} received. Preloading with interleaved frames...")
-            op_B_begin(s_control, free_list_id, nframes)
-            
-            # Loop with an index 'i' to decide which frame to send on each iteration
-            for i in range(nframes):
-                # If i is even, send frame_A. If i is odd, send frame_B.
-                frames_to_send = frame_A() if i % 2 == 0 else frame_B()
-                op_P_push(s_control, free_list_id, frames_to_send)
-            
-            op_E_end(s_control, free_list_id)
+            with corked(s_control):
+                op_B_begin(s_control, free_list_id, nframes)
+
+                # Loop with an index 'i' to decide which frame to send on each iteration
+                for i in range(nframes):
+                    # If i is even, send frame_A. If i is odd, send frame_B.
+                    frames_to_send = frame_A() if i % 2 == 0 else frame_B()
+                    op_P_push(s_control, free_list_id, frames_to_send)
+
+                op_E_end(s_control, free_list_id)
 
             print(f"    -> Preloading list {free_list_id} complete.")
 
@@ -3,15 +3,13 @@
 """
 Final, event-driven, dual-channel AWG client.
 - Connects to a command channel (9100) and a notification channel (9101).
-- Uses a background thread to listen for precise per-list status notifications.
-- The main thread waits for an IDLE notification before preloading the next list.
+- Runs both channels on a single asyncio event loop (no listener thread, no lock).
+- The main coroutine waits for an IDLE notification before preloading the next list.
 """
 
+import asyncio
 import socket
 import struct
-import time
-import threading
-import queue
 
 # ---------- Connection settings ----------
 HOST = "wavegenz7.local"
@@ -19,165 +17,156 @@ CONTROL_PORT = 9100
 NOTIFY_PORT = 9101
 CONNECT_TIMEOUT = 3.0
 
-# --- Thread synchronization primitives ---
-# A thread-safe queue to pass the ID of a newly freed list from the
-# notification thread to the main thread.
-free_list_queue = queue.Queue()
-
 # --- Protocol and Frame Generation Helpers (unchanged) ---
 def pack_word(cmd: int, ch: int, tone: int, data20: int) -> int: return ((cmd & 0xF) << 28) | ((ch & 1) << 27) | ((tone & 0x7) << 24) | (data20 & 0xFFFFF)
 def make_index_word(ch: int, tone: int, idx20: int) -> int: return pack_word(0x1, ch, tone, idx20)
 def make_gain_word(ch: int, tone: int, g20: int) -> int: return pack_word(0x2, ch, tone, g20)
 def make_commit_word() -> int: return (0xF << 28)
-def frame_A(): return [make_index_word(0,0,0x001), make_gain_word(0,0,0x1FFFF), make_commit_word()]
-def frame_B(): return [make_index_word(0,0,0x020), make_gain_word(0,0,0x1FFFF), make_commit_word()]
-
-# --- Socket and Protocol Operation Helpers (unchanged) ---
-def connect_socket(ip: str, port: int, timeout=CONNECT_TIMEOUT) -> socket.socket:
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.settimeout(timeout)
-    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-    s.connect((ip, port))
-    return s
-def op_Z_reset(s): s.sendall(b'Z')
-def op_B_begin(s, list_id: int, total_frames: int): s.sendall(b'B' + struct.pack(">BI", list_id, total_frames))
-def op_P_push(s, list_id: int, words):
-    payload = b''.join(struct.pack(">I", w) for w in words)
-    s.sendall(b'P' + struct.pack(">BH", list_id, len(words)) + payload)
-def op_E_end(s, list_id: int): s.sendall(b'E' + struct.pack(">B", list_id))
+# Frames are pure functions of constants: evaluate once at module load (words and packed bytes)
+FRAME_A = (make_index_word(0,0,0x001), make_gain_word(0,0,0x1FFFF), make_commit_word())
+FRAME_B = (make_index_word(0,0,0x020), make_gain_word(0,0,0x1FFFF), make_commit_word())
+FRAME_A_BYTES = struct.pack(">3I", *FRAME_A)
+FRAME_B_BYTES = struct.pack(">3I", *FRAME_B)
 
 # --- [NEW] Helper function to build a large batch of 'P' commands in memory ---
 def build_p_command_batch(list_id: int, nframes: int) -> bytes:
     """
     Builds a single, large bytes object containing a sequence of 'P' commands
-    for all frames in a list. The content alternates between frame_A and frame_B.
+    for all frames in a list. The content alternates between FRAME_A and FRAME_B.
+    Each packet is the per-list 'P' + header prefix followed by a pre-packed frame.
+    """
+    prefix = struct.pack(">cBH", b'P', list_id, 3)
+    packet_a = prefix + FRAME_A_BYTES
+    packet_b = prefix + FRAME_B_BYTES
+    return (packet_a + packet_b) * (nframes // 2) + (packet_a if nframes & 1 else b'')
+
+# --- Precomputed per-list command bytes ---
+# nframes and list_id (0/1) are fixed, so every preload sends identical bytes:
+# build them once at startup and keep batch construction off the IDLE -> preload path.
+NFRAMES = 20
+PRECOMPUTED = {lid: build_p_command_batch(lid, NFRAMES) for lid in (0, 1)}
+BEGIN_BYTES = {lid: b'B' + struct.pack(">BI", lid, NFRAMES) for lid in (0, 1)}
+END_BYTES   = {lid: b'E' + struct.pack(">B", lid) for lid in (0, 1)}
+# B + P*NFRAMES + E as one buffer: a single sendall per preload instead of three writes
+# (with TCP_NODELAY each write could otherwise leave as its own segment)
+FULL_BYTES  = {lid: BEGIN_BYTES[lid] + PRECOMPUTED[lid] + END_BYTES[lid] for lid in (0, 1)}
+
+# --- Notification Listener Coroutine ---
+async def notification_listener(reader: asyncio.StreamReader, free_list_queue: asyncio.Queue):
+    """
+    Reads "LIST<id>:<STATE>" lines from the notify channel and puts the id of
+    each list that became IDLE on free_list_queue. Runs on the same event loop
+    as main(), so the handoff needs no cross-thread lock.
     """
-    all_packets = []
-    for i in range(nframes):
-        # Determine which frame to use for this iteration
-        words = frame_A() if i % 2 == 0 else frame_B()
-        
-        # Pack the word payload (e.g., [idx, gain, commit])
-        payload = b''.join(struct.pack(">I", w) for w in words)
-        
-        # Construct the complete 'P' command packet (P + header + payload)
-        packet = b'P' + struct.pack(">BH", list_id, len(words)) + payload
-        
-        # Add the packet to our list
-        all_packets.append(packet)
-        
-    # Join all the small packets into one giant bytes object and return it
-    return b''.join(all_packets)
-
-# --- [MODIFIED] Notification Listener Thread ---
-def notification_listener(host_ip: str, port: int):
-    s_notify = None
     try:
-        s_notify = connect_socket(host_ip, port)
-        s_notify.settimeout(None)
-        print(f"[NOTIFY] Connected to notification server on port {port}")
-        
-        buffer = b""
         while True:
-            data = s_notify.recv(1024)
-            if not data:
+            try:
+                line = await reader.readuntil(b'\n')
+            except asyncio.IncompleteReadError:
                 print("\n[NOTIFY] Server closed notification channel.")
                 break
-            
-            buffer += data
-            while b'\n' in buffer:
-                message_bytes, buffer = buffer.split(b'\n', 1)
-                message = message_bytes.decode().strip()
-                if not message: continue
-
-                print(f"\n[NOTIFY] Received: {message}")
-                
-                # Parse "LIST<id>:<STATE>" message
-                if ":" in message:
-                    parts = message.split(':')
-                    if len(parts) == 2 and parts[0].startswith("LIST") and parts[1] == "IDLE":
-                        try:
-                            list_id = int(parts[0][4:])
-                            free_list_queue.put(list_id)
-                        except ValueError:
-                            print(f"[NOTIFY] Could not parse list_id from '{parts[0]}'")
+
+            message = line.decode().strip()
+            if not message: continue
+
+            print(f"\n[NOTIFY] Received: {message}")
+
+            # Parse "LIST<id>:<STATE>" message
+            if ":" in message:
+                parts = message.split(':')
+                if len(parts) == 2 and parts[0].startswith("LIST") and parts[1] == "IDLE":
+                    try:
+                        list_id = int(parts[0][4:])
+                        free_list_queue.put_nowait(list_id)
+                    except ValueError:
+                        print(f"[NOTIFY] Could not parse list_id from '{parts[0]}'")
 
     except Exception as e:
         print(f"\n[NOTIFY] Error in listener: {e}")
     finally:
-        if s_notify: s_notify.close()
-        print("[NOTIFY] Listener thread exiting.")
-        free_list_queue.put(None) # Sentinel value to unblock the main thread
-
-# --- [MODIFIED] Main logic using batch transfers for high performance ---
-def main():
-    s_control = None
-    notify_thread = None
+        print("[NOTIFY] Listener exiting.")
+        free_list_queue.put_nowait(None) # Sentinel value to unblock main()
+
+async def open_channel(ip: str, port: int, timeout=CONNECT_TIMEOUT):
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return reader, writer
+
+# --- Main logic: one event loop drives both the control and notify channels ---
+async def main():
+    w_control = None
+    w_notify = None
+    notify_task = None
+    free_list_queue = asyncio.Queue()
     try:
         print(f"[CLIENT] Resolving {HOST}...")
         ip = socket.gethostbyname(HOST)
 
         print(f"[CLIENT] Connecting to control port {ip}:{CONTROL_PORT}...")
-        s_control = connect_socket(ip, CONTROL_PORT)
+        _, w_control = await open_channel(ip, CONTROL_PORT)
         print("[CLIENT] Control channel connected.")
 
-        notify_thread = threading.Thread(target=notification_listener, args=(ip, NOTIFY_PORT))
-        notify_thread.daemon = True
-        notify_thread.start()
+        r_notify, w_notify = await open_channel(ip, NOTIFY_PORT)
+        print(f"[NOTIFY] Connected to notification server on port {NOTIFY_PORT}")
+        notify_task = asyncio.create_task(notification_listener(r_notify, free_list_queue))
 
         print("[CLIENT] Sending RESET...")
-        op_Z_reset(s_control)
-        nframes = 20
+        w_control.write(b'Z')
+        nframes = NFRAMES
 
-        # --- [MODIFIED] 1. Initial Priming using a single batch transfer ---
+        # --- 1. Initial Priming using a single batch transfer ---
         for list_id_to_prime in [0, 1]:
-            print(f"[*] Main thread waiting for an IDLE slot...")
-            free_id = free_list_queue.get(timeout=5.0)
-            if free_id is None: raise ConnectionError("Notify thread died")
-            
+            print(f"[*] Waiting for an IDLE slot...")
+            free_id = await asyncio.wait_for(free_list_queue.get(), timeout=5.0)
+            if free_id is None: raise ConnectionError("Notify channel closed")
+
             print(f"    -> Priming list {free_id} with a batch of {nframes} frames...")
-            op_B_begin(s_control, free_id, nframes)
-            
-            # Build the entire batch in memory first
-            batch_data = build_p_command_batch(free_id, nframes)
-            print(f"    -> Batch created ({len(batch_data)} bytes). Sending now...")
-            # Send the entire batch in a single network operation
-            s_control.sendall(batch_data)
-                
-            op_E_end(s_control, free_id)
-        
-        # --- [MODIFIED] 2. Main event-driven loop using a single batch transfer ---
+            # B/P*/E were built at startup; send them in a single network operation
+            batch_data = FULL_BYTES[free_id]
+            print(f"    -> Sending precomputed B/P/E ({len(batch_data)} bytes)...")
+            w_control.write(batch_data)
+            await w_control.drain()
+
+        # --- 2. Main event-driven loop using a single batch transfer ---
         print("\n[CLIENT] Entering event-driven loop... Press Ctrl+C to exit.")
         while True:
-            print(f"[*] Main thread waiting for a list to become free...")
-            free_list_id = free_list_queue.get()
-            
-            if free_list_id is None:
+            print(f"[*] Waiting for a list to become free...")
+            free_ids = [await free_list_queue.get()]
+            # Drain IDLE signals that are already pending (e.g. both lists went
+            # IDLE back to back) so their preloads go out in a single write
+            while True:
+                try:
+                    free_ids.append(free_list_queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            closed = None in free_ids
+            free_ids = list(dict.fromkeys(i for i in free_ids if i is not None))
+
+            if free_ids:
+                print(f"    -> IDLE signal for list(s) {free_ids} received. Preloading with a batch...")
+                # Coalesce the precomputed B/P*/E of every free list into one write
+                batch_data = b''.join(FULL_BYTES[i] for i in free_ids)
+                print(f"    -> Sending precomputed B/P/E ({len(batch_data)} bytes)...")
+                w_control.write(batch_data)
+                await w_control.drain()
+                print(f"    -> Preloading list(s) {free_ids} complete.")
+
+            if closed:
                 print("[CLIENT] Notification channel closed. Exiting.")
                 break
 
-            print(f"    -> IDLE signal for list {free_list_id} received. Preloading with a batch...")
-            op_B_begin(s_control, free_list_id, nframes)
-            
-            # Build and send the batch in the same way
-            batch_data = build_p_command_batch(free_list_id, nframes)
-            print(f"    -> Batch created ({len(batch_data)} bytes). Sending now...")
-            s_control.sendall(batch_data)
-            
-            op_E_end(s_control, free_list_id)
-
-            print(f"    -> Preloading list {free_list_id} complete.")
-
-    except (KeyboardInterrupt, queue.Empty):
+    except asyncio.TimeoutError:
         print("\n[CLIENT] Operation stopped or timed out.")
-    # ... (rest of exception handling and finally block is the same) ...
     finally:
         print("[CLIENT] Closing connection.")
-        if s_control: s_control.close()
-        if notify_thread and notify_thread.is_alive():
-             free_list_queue.put(None)
-             notify_thread.join(timeout=1.0)
+        if notify_task: notify_task.cancel()
+        for w in (w_control, w_notify):
+            if w: w.close()
         print("[CLIENT] Done.")
 
 if __name__ == "__main__":
-    main()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n[CLIENT] Operation stopped or timed out.")
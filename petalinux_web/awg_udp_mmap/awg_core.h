@@ -15,8 +15,28 @@ int awg_send_hex4(
     const char *gainB_hex   // 144 hex chars
 );
 
+// 傳送一整幀 336 hex（上面 4 段依序相連），內部切段
+int awg_send_hex_frame336(const char *frame336);
+
+// 傳送一組二進位幀（little-endian，4 段：8×u16, 8×u32, 8×u16, 8×u32 = 96 bytes）
+int awg_send_bin4(
+    const void *idxA_le16,  // 8 × uint16
+    const void *gainA_le32, // 8 × uint32（僅低 20 bits）
+    const void *idxB_le16,  // 8 × uint16
+    const void *gainB_le32  // 8 × uint32（僅低 20 bits）
+);
+
 int awg_send_words32(const uint32_t *words32, int count);
 
+// UDP 批次：recvmmsg 一次收最多 max_msgs 包（336 hex 或 96 bytes 二進位），逐包送出
+// 回傳送出的幀數，錯誤回傳 -errno
+int awg_recv_and_send_batch(int fd, int max_msgs);
+
+#ifdef AWG_HAVE_LIBURING
+// io_uring worker：在 fd 上持續收包並送出，直到被訊號中斷（回傳 -EINTR）或出錯（-errno）
+int awg_serve_udp_io_uring(int fd, int concurrency);
+#endif
+
 // 結束 (釋放資源)
 void awg_close(void);
 
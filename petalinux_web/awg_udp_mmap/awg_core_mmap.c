@@ -1,12 +1,14 @@
 // =============================================================
-// awg_core.c  —  High-speed AWG GPIO core (C, mmap /dev/mem)
+// awg_core_mmap.c  —  High-speed AWG GPIO core (C, mmap /dev/mem)
 // -------------------------------------------------------------
 // Build (shared lib):
-//   gcc -O3 -fPIC -shared -o libawg_core.so awg_core.c
+//   gcc -O3 -fPIC -shared -o libawg_core_mmap.so awg_core_mmap.c
+//   # 加上 io_uring 收包 worker（需 liburing）：
+//   gcc -O3 -fPIC -shared -DAWG_HAVE_LIBURING -o libawg_core_mmap.so awg_core_mmap.c -luring
 //
 // Minimal Python usage (ctypes):
 //   import ctypes
-//   lib = ctypes.CDLL("./libawg_core.so")
+//   lib = ctypes.CDLL("./libawg_core_mmap.so")
 //   assert lib.awg_init() == 0
 //   lib.awg_send_hex4(b"...24hex...", b"...144hex...", b"...24hex...", b"...144hex...")
 //   lib.awg_close()
@@ -27,6 +29,10 @@
 //   Both channels (A+B): 336 hex total, but passed as 4 groups to improve readability.
 //   Order within each group is tone 0..7 (exactly 8 tones).
 //
+//   Binary alternative (awg_send_bin4, 96 bytes, little-endian):
+//     idxA 8*u16 | gainA 8*u32 | idxB 8*u16 | gainB 8*u32
+//     Same values as above, no hex decode (Python: struct "<8H8I8H8I").
+//
 // -------------------------------------------------------------
 // HW Notes (AXI GPIO, single channel each):
 //   - DATA bus AXI GPIO (32-bit wide):
@@ -48,6 +54,7 @@
 //   [19:0]  payload: idx20 or gain20 (Q1.17 low 20 bits)
 // =============================================================
 
+#define _GNU_SOURCE   // recvmmsg
 #include <stdint.h>
 #include <stdlib.h>
 #include <string.h>
@@ -56,6 +63,8 @@
 #include <unistd.h>
 #include <fcntl.h>
 #include <sys/mman.h>
+#include <sys/socket.h>
+#include <errno.h>
 
 // ------------------ AXI GPIO base addresses (EDIT THESE) ------------------
 // >>>>> 依你的設計修改下列兩個 BASE 實體位址（Vivado Address Editor）
@@ -77,6 +86,15 @@
 // Hex 長度（僅供註解參考；此版本不做 strlen 檢查以求極速）
 enum { IDX_HEX_LEN = 24, GAIN_HEX_LEN = 144 };
 
+// UDP 批次接收：一個 datagram = 一幀 336 hex（idxA|gainA|idxB|gainB）
+enum { FRAME_HEX_LEN = 2 * (IDX_HEX_LEN + GAIN_HEX_LEN), RECV_BATCH_MAX = 32 };
+
+// 二進位幀（little-endian，Python struct "<8H8I8H8I"）：
+//   idxA 8×u16 | gainA 8×u32 | idxB 8×u16 | gainB 8×u32  = 96 bytes
+//   gain 只取低 20 bits（Q1.17 = 0..0x1FFFF），不必做任何 hex 解析
+enum { IDX_BIN_LEN = 8 * 2, GAIN_BIN_LEN = 8 * 4,
+       FRAME_BIN_LEN = 2 * (IDX_BIN_LEN + GAIN_BIN_LEN) };
+
 // ------------------ MMAP globals ------------------
 static int                g_fd_mem     = -1;
 static volatile uint32_t *g_data_regs  = NULL;  // 指向 DATA GPIO base
@@ -140,6 +158,16 @@ static inline uint32_t parse_gain18_low5_fast(const char *p18) {
     return parse_hex_n(p18 + 13, 5);         // 僅取最低 20 bits
 }
 
+// ------------------ Binary (little-endian) loads ------------------
+// 逐 byte 組合：不受對齊限制，也不依賴主機 endianness
+static inline uint32_t ld_le16(const uint8_t *p) {
+    return (uint32_t)p[0] | ((uint32_t)p[1] << 8);
+}
+static inline uint32_t ld_le32(const uint8_t *p) {
+    return (uint32_t)p[0] | ((uint32_t)p[1] << 8) |
+           ((uint32_t)p[2] << 16) | ((uint32_t)p[3] << 24);
+}
+
 // ------------------ Low-level AWG strobes ------------------
 static inline void write_word32(uint32_t w) {
     gpio_write(g_data_regs, GPIO_DATA_OFFSET, w);
@@ -240,6 +268,53 @@ int awg_send_hex4(const char *idxA_hex, const char *gainA_hex,
     return 0;
 }
 
+// ---- 單一 336 hex 幀（idxA|gainA|idxB|gainB 連續），內部自行切 4 段 ----
+int awg_send_hex_frame336(const char *frame336)
+{
+    if (!frame336) return -2;
+    return awg_send_hex4(frame336,
+                         frame336 + IDX_HEX_LEN,
+                         frame336 + IDX_HEX_LEN + GAIN_HEX_LEN,
+                         frame336 + 2 * IDX_HEX_LEN + GAIN_HEX_LEN);
+}
+
+// ---- Binary path: 4 段 little-endian 陣列（8×u16 idx, 8×u32 gain），免 hex 解析 ----
+int awg_send_bin4(const void *idxA_le16, const void *gainA_le32,
+                  const void *idxB_le16, const void *gainB_le32)
+{
+    if (!g_data_regs || !g_wen_regs) return -1;
+    if (!idxA_le16 || !gainA_le32 || !idxB_le16 || !gainB_le32) return -2;
+
+    const uint8_t *ia = idxA_le16, *ga = gainA_le32;
+    const uint8_t *ib = idxB_le16, *gb = gainB_le32;
+
+    // Channel A: 8*index, 8*gain
+    for (int t = 0; t < 8; ++t) {
+        write_word32(make_index_word(0, t, ld_le16(ia + 2 * t)));
+        wen_edge(DEF_WEN_ACTHI, DEF_WEN_US);
+    }
+    for (int t = 0; t < 8; ++t) {
+        write_word32(make_gain_word(0, t, ld_le32(ga + 4 * t) & 0xFFFFFu));
+        wen_edge(DEF_WEN_ACTHI, DEF_WEN_US);
+    }
+
+    // Channel B: 8*index, 8*gain
+    for (int t = 0; t < 8; ++t) {
+        write_word32(make_index_word(1, t, ld_le16(ib + 2 * t)));
+        wen_edge(DEF_WEN_ACTHI, DEF_WEN_US);
+    }
+    for (int t = 0; t < 8; ++t) {
+        write_word32(make_gain_word(1, t, ld_le32(gb + 4 * t) & 0xFFFFFu));
+        wen_edge(DEF_WEN_ACTHI, DEF_WEN_US);
+    }
+
+    // Commit once
+    write_word32(make_commit_word());
+    wen_edge(DEF_WEN_ACTHI, DEF_WEN_US);
+
+    return 0;
+}
+
 // Flexible version: stream exactly "count" words (caller decides commit)
 int awg_send_words32(const uint32_t *words32, int count)
 {
@@ -251,4 +326,116 @@ int awg_send_words32(const uint32_t *words32, int count)
         wen_edge(DEF_WEN_ACTHI, DEF_WEN_US);
     }
     return 0;
-}
\ No newline at end of file
+}
+
+// ---- 依 datagram 長度分派：336 = ASCII-hex 幀，96 = 二進位幀，其他丟掉 ----
+static int send_datagram(const char *f, size_t len)
+{
+    if (len == FRAME_HEX_LEN)
+        return awg_send_hex_frame336(f);
+    if (len == FRAME_BIN_LEN)
+        return awg_send_bin4(f, f + IDX_BIN_LEN,
+                             f + IDX_BIN_LEN + GAIN_BIN_LEN,
+                             f + 2 * IDX_BIN_LEN + GAIN_BIN_LEN);
+    return -3;  // 丟掉非固定長度的包
+}
+
+// ---- UDP batch path: recvmmsg() 一次收多包，逐包解析送出，不回到 Python ----
+// fd: 已 bind 的 UDP socket；max_msgs: 單次最多收幾包（上限 RECV_BATCH_MAX）
+// 阻塞直到至少 1 包（MSG_WAITFORONE），之後只取已到的包。
+// 依長度分派：336 = ASCII-hex 幀，96 = 二進位幀
+// 回傳：送出的幀數（其他長度的包會被丟掉、不計入），錯誤回傳 -errno
+int awg_recv_and_send_batch(int fd, int max_msgs)
+{
+    static char           bufs[RECV_BATCH_MAX][FRAME_HEX_LEN];
+    static struct iovec   iov[RECV_BATCH_MAX];
+    static struct mmsghdr msgs[RECV_BATCH_MAX];
+
+    if (!g_data_regs || !g_wen_regs) return -1;
+    if (max_msgs <= 0 || max_msgs > RECV_BATCH_MAX) max_msgs = RECV_BATCH_MAX;
+
+    for (int i = 0; i < max_msgs; ++i) {
+        iov[i].iov_base = bufs[i];
+        iov[i].iov_len  = FRAME_HEX_LEN;
+        memset(&msgs[i].msg_hdr, 0, sizeof(msgs[i].msg_hdr));
+        msgs[i].msg_hdr.msg_iov    = &iov[i];
+        msgs[i].msg_hdr.msg_iovlen = 1;
+    }
+
+    int n = recvmmsg(fd, msgs, (unsigned)max_msgs, MSG_WAITFORONE, NULL);
+    if (n < 0) return -errno;
+
+    int sent = 0;
+    for (int i = 0; i < n; ++i) {
+        // 丟掉被截斷的包
+        if (msgs[i].msg_hdr.msg_flags & MSG_TRUNC) continue;
+        if (send_datagram(bufs[i], msgs[i].msg_len) == 0) ++sent;
+    }
+    return sent;
+}
+
+#ifdef AWG_HAVE_LIBURING
+#include <liburing.h>
+
+// ---- io_uring worker：收包 → 解析 → 寫 MMIO 全在 C 內，直到訊號中斷 ----
+// fd: 已 bind 的 UDP socket（socket 選項由呼叫端設定）
+// concurrency: 同時掛著的 recv 數（每個一塊固定 336 bytes 緩衝，上限 URING_SLOTS_MAX）
+// 每個 completion 處理完立刻重新掛 recv；多個 SQE 一次 submit，syscall 攤提到接近 0
+// 回傳：被訊號中斷時 -EINTR（Python 端接著處理 KeyboardInterrupt），其他錯誤 -errno
+enum { URING_SLOTS_MAX = 64 };
+
+static int uring_arm_recv(struct io_uring *ring, int fd, char *buf, unsigned slot)
+{
+    struct io_uring_sqe *sqe = io_uring_get_sqe(ring);
+    if (!sqe) return -EBUSY;
+    // MSG_TRUNC：res 回報 datagram 原長度，可辨識超長包
+    io_uring_prep_recv(sqe, fd, buf, FRAME_HEX_LEN, MSG_TRUNC);
+    io_uring_sqe_set_data64(sqe, slot);
+    return 0;
+}
+
+int awg_serve_udp_io_uring(int fd, int concurrency)
+{
+    static char bufs[URING_SLOTS_MAX][FRAME_HEX_LEN];
+    struct io_uring ring;
+
+    if (!g_data_regs || !g_wen_regs) return -1;
+    if (concurrency <= 0 || concurrency > URING_SLOTS_MAX) concurrency = URING_SLOTS_MAX;
+
+    int r = io_uring_queue_init(2 * URING_SLOTS_MAX, &ring, 0);
+    if (r < 0) return r;
+
+    for (int i = 0; i < concurrency; ++i) {
+        if ((r = uring_arm_recv(&ring, fd, bufs[i], (unsigned)i)) < 0) goto out;
+    }
+
+    for (;;) {
+        struct io_uring_cqe *cqe;
+        // 送出上一輪重新掛上的 recv，同時等至少一個 completion（一次 syscall）
+        r = io_uring_submit_and_wait(&ring, 1);
+        if (r < 0) goto out;
+
+        unsigned head, seen = 0;
+        io_uring_for_each_cqe(&ring, head, cqe) {
+            unsigned slot = (unsigned)io_uring_cqe_get_data64(cqe);
+            int res = cqe->res;
+            ++seen;
+            if (res < 0 && res != -EAGAIN && res != -EINTR) {
+                r = res;
+                io_uring_cq_advance(&ring, seen);
+                goto out;
+            }
+            if (res > 0) send_datagram(bufs[slot], (size_t)res);
+            if ((r = uring_arm_recv(&ring, fd, bufs[slot], slot)) < 0) {
+                io_uring_cq_advance(&ring, seen);
+                goto out;
+            }
+        }
+        io_uring_cq_advance(&ring, seen);
+    }
+
+out:
+    io_uring_queue_exit(&ring);
+    return r;
+}
+#endif // AWG_HAVE_LIBURING
@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import os, socket, ctypes, signal
+import os, socket, ctypes, errno
 
 HOST, PORT = "0.0.0.0", 8766           # 換成你要的 UDP 監聽埠
 LIB_PATH   = os.path.join(os.path.dirname(__file__), "libawg_core_mmap.so")
@@ -7,17 +7,54 @@ LIB_PATH   = os.path.join(os.path.dirname(__file__), "libawg_core_mmap.so")
 # 載入 C 函式庫
 lib = ctypes.CDLL(LIB_PATH)
 lib.awg_init.restype = ctypes.c_int
-lib.awg_send_hex4.argtypes = [ctypes.c_char_p, ctypes.c_char_p,
-                              ctypes.c_char_p, ctypes.c_char_p]
+# 以位址（c_void_p）傳入：指向常駐接收區內的 4 段，不必每包產生 bytes
+lib.awg_send_hex4.argtypes = [ctypes.c_void_p, ctypes.c_void_p,
+                              ctypes.c_void_p, ctypes.c_void_p]
 lib.awg_send_hex4.restype = ctypes.c_int
+# 以下較新的符號都以 hasattr 檢查：舊版 .so（只有 awg_send_hex4）照樣能跑
+# 整幀 336 hex 一個指標：C 端以固定 offset 0/24/168/192 自行切段
+HAVE_FRAME336 = hasattr(lib, "awg_send_hex_frame336")
+if HAVE_FRAME336:
+    lib.awg_send_hex_frame336.argtypes = [ctypes.c_void_p]
+    lib.awg_send_hex_frame336.restype = ctypes.c_int
+# 二進位幀（沒有這個符號就不收二進位幀）
+HAVE_BIN4 = hasattr(lib, "awg_send_bin4")
+if HAVE_BIN4:
+    lib.awg_send_bin4.argtypes = [ctypes.c_void_p, ctypes.c_void_p,
+                                  ctypes.c_void_p, ctypes.c_void_p]
+    lib.awg_send_bin4.restype = ctypes.c_int
 lib.awg_close.restype = None
+# 收包路徑優先順序：io_uring worker > recvmmsg 批次 > 逐包 recvfrom_into
+# 前兩者整個「收包→解析→寫 MMIO」迴圈都在 C 內、呼叫期間釋放 GIL，
+# Python 每批只進出一次（不另用 JIT 編譯迴圈：熱路徑上已沒有 Python bytecode）
+# 批次接收（recvmmsg）：舊版 .so 沒有這個符號時退回逐包 recvfrom_into
+HAVE_BATCH = hasattr(lib, "awg_recv_and_send_batch")
+if HAVE_BATCH:
+    lib.awg_recv_and_send_batch.argtypes = [ctypes.c_int, ctypes.c_int]
+    lib.awg_recv_and_send_batch.restype = ctypes.c_int
+RECV_BATCH = 32                         # 每次 recvmmsg 最多收幾包
+# io_uring worker（以 -DAWG_HAVE_LIBURING 編譯才有）：整個收包迴圈都在 C 內
+HAVE_URING = hasattr(lib, "awg_serve_udp_io_uring")
+if HAVE_URING:
+    lib.awg_serve_udp_io_uring.argtypes = [ctypes.c_int, ctypes.c_int]
+    lib.awg_serve_udp_io_uring.restype = ctypes.c_int
+URING_DEPTH = 32                        # 同時掛著的 recv 數
 
-# 固定 336 bytes 的 ASCII-hex 幀切片
+# 低尾延遲：recv 時讓 kernel 在 driver 內忙等 BUSY_POLL_US，省掉 softirq→喚醒
+# （需 kernel 支援；無權限 / 不支援就略過）。
+# 綁核為選用（與 awg_core 相同，設 AWG_REALTIME=1 才啟用）：收包與本程序綁同一顆核心 RX_CPU；
+# RX_CPU = None 時兩者都不設
+SO_BUSY_POLL    = getattr(socket, "SO_BUSY_POLL", 46)
+SO_INCOMING_CPU = getattr(socket, "SO_INCOMING_CPU", 49)
+BUSY_POLL_US    = 50
+RX_CPU          = (os.cpu_count() or 1) - 1 if os.environ.get("AWG_REALTIME") == "1" else None
+
+# 固定 336 bytes 的 ASCII-hex 幀（C 端以 offset 0/24/168/192 切段）
 FRAME = 336
-A_IDX = slice(0, 24)
-A_GAN = slice(24, 168)
-B_IDX = slice(168, 192)
-B_GAN = slice(192, 336)
+
+# 二進位幀（"<8H8I8H8I"，96 bytes）：idx u16 ×8 | gain u32 ×8，A 再 B，免 hex 解析
+FRAME_BIN = 96
+BIN_A_IDX, BIN_A_GAN, BIN_B_IDX, BIN_B_GAN = 0, 16, 48, 64
 
 def main():
     # 初始化硬體
@@ -33,27 +70,62 @@ def main():
     except OSError: pass
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1<<20)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1<<20)
+    try: sock.setsockopt(socket.SOL_SOCKET, SO_BUSY_POLL, BUSY_POLL_US)
+    except OSError: pass
+    if RX_CPU is not None:
+        try:
+            os.sched_setaffinity(0, {RX_CPU})
+            sock.setsockopt(socket.SOL_SOCKET, SO_INCOMING_CPU, RX_CPU)
+        except (AttributeError, OSError) as e:
+            print(f"[UDP] pin to cpu {RX_CPU} failed: {e}")
     sock.bind((HOST, PORT))
 
-    print(f"[UDP] Serving on udp://{HOST}:{PORT}  (expect {FRAME} bytes per datagram)")
+    print(f"[UDP] Serving on udp://{HOST}:{PORT}  (expect {FRAME} hex / {FRAME_BIN} bin bytes per datagram)"
+          f"{'  [io_uring]' if HAVE_URING else '  [recvmmsg x%d]' % RECV_BATCH if HAVE_BATCH else ''}")
 
     buf = bytearray(FRAME)         # 接收區
-    mv  = memoryview(buf)
+    # 以 ctypes 陣列綁定同一塊記憶體（from_buffer 不複製），先算好幀/各段的位址
+    cbuf = (ctypes.c_char * FRAME).from_buffer(buf)
+    base = ctypes.addressof(cbuf)
+    q_a_idx = base + BIN_A_IDX
+    q_a_gan = base + BIN_A_GAN
+    q_b_idx = base + BIN_B_IDX
+    q_b_gan = base + BIN_B_GAN
+    if HAVE_FRAME336:
+        send_frame336 = lib.awg_send_hex_frame336
+    else:
+        send_hex4 = lib.awg_send_hex4
+        send_frame336 = lambda p: send_hex4(p, p + 24, p + 168, p + 192)
+    send_bin4 = lib.awg_send_bin4 if HAVE_BIN4 else None
+    recv_into = sock.recvfrom_into
 
     try:
-        while True:
-            n, addr = sock.recvfrom_into(buf)   # 一次一包
-            if n != FRAME:
-                # 丟掉非固定長度的包，必要時可加 JSON fallback
-                continue
+        if HAVE_URING:
+            # 阻塞在 C 內直到訊號中斷；io_uring 不可用（舊 kernel / seccomp）就往下退回 recvmmsg
+            fd = sock.fileno()
+            while True:
+                r = lib.awg_serve_udp_io_uring(fd, URING_DEPTH)
+                if r != -errno.EINTR:
+                    print(f"[UDP] io_uring worker ret={r} ({os.strerror(-r) if r < 0 else ''}), fallback")
+                    break
+
+        if HAVE_BATCH:
+            # 收包 + 解析 + 送出全在 C 內完成，一次 syscall 最多 RECV_BATCH 包
+            fd = sock.fileno()
+            batch = lib.awg_recv_and_send_batch
+            while True:
+                r = batch(fd, RECV_BATCH)
+                if r < 0 and r != -errno.EINTR:
+                    raise OSError(-r, os.strerror(-r))
 
-            # 直接把 4 段切給 C（避免多餘複製）
-            r = lib.awg_send_hex4(
-                ctypes.c_char_p(mv[A_IDX].tobytes()),
-                ctypes.c_char_p(mv[A_GAN].tobytes()),
-                ctypes.c_char_p(mv[B_IDX].tobytes()),
-                ctypes.c_char_p(mv[B_GAN].tobytes()),
-            )
+        while True:
+            n, addr = recv_into(buf)   # 一次一包
+            # 直接把接收區內 4 段的位址交給 C（每包零配置、零複製）
+            if n == FRAME_BIN and send_bin4 is not None:
+                r = send_bin4(q_a_idx, q_a_gan, q_b_idx, q_b_gan)
+            elif n == FRAME:
+                r = send_frame336(base)
+            # 其他長度直接丟掉，必要時可加 JSON fallback
             # r!=0 可印錯，但為了極速建議關閉
             # if r != 0: print("[UDP] awg_send_hex4 ret=", r)
 
@@ -61,6 +133,7 @@ def main():
         pass
     finally:
         sock.close()
+        del cbuf                   # 釋放 buffer export
         lib.awg_close()
         print("[UDP] stopped")
 
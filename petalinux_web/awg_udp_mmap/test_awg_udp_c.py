@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import socket, time
+import socket, struct, time
 
 DEST = ("wavegenz7.local", 8766)   # 改成你的板子 IP / 埠
 
@@ -14,7 +14,16 @@ def gain_hex():
     g0 = "000000000000000000"
     return g1 + g0*7       # 144 chars
 
+# 二進位幀（server 端 awg_send_bin4）："<8H8I8H8I" = 96 bytes，免 hex 編碼/解析
+BIN = struct.Struct("<8H8I8H8I")
+BINARY = True                        # False：改送 336 bytes ASCII-hex（舊格式）
+
 def build_frame(idxA, idxB):
+    # 8 tones：tone0=active idx / 最大 gain，其餘 0
+    gains = (0x1FFFF,) + (0,)*7
+    return BIN.pack(idxA, *(0,)*7, *gains, idxB, *(0,)*7, *gains)
+
+def build_frame_hex(idxA, idxB):
     a_idx = idx_hex(idxA)
     a_gan = gain_hex()
     b_idx = idx_hex(idxB)
@@ -30,8 +39,9 @@ if __name__ == "__main__":
     try: s.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, 0x10)
     except OSError: pass
 
-    f1 = build_frame(1, 1)    # 1 kHz
-    f2 = build_frame(20, 20)  # 20 kHz
+    build = build_frame if BINARY else build_frame_hex
+    f1 = build(1, 1)    # 1 kHz
+    f2 = build(20, 20)  # 20 kHz
     toggle = False
 
     try:
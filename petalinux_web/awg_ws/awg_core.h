@@ -15,6 +15,9 @@ int awg_send_hex4(
     const char *gainB_hex   // 144 hex chars
 );
 
+// 傳送一整幀 336 hex（上面 4 段依序相連），內部切段
+int awg_send_hex_frame336(const char *frame336);
+
 int awg_send_words32(const uint32_t *words32, int count);
 
 // 結束 (釋放資源)
@@ -240,6 +240,16 @@ int awg_send_hex4(const char *idxA_hex, const char *gainA_hex,
     return 0;
 }
 
+// ---- 單一 336 hex 幀（idxA|gainA|idxB|gainB 連續），內部自行切 4 段 ----
+int awg_send_hex_frame336(const char *frame336)
+{
+    if (!frame336) return -2;
+    return awg_send_hex4(frame336,
+                         frame336 + IDX_HEX_LEN,
+                         frame336 + IDX_HEX_LEN + GAIN_HEX_LEN,
+                         frame336 + 2 * IDX_HEX_LEN + GAIN_HEX_LEN);
+}
+
 // Flexible version: stream exactly "count" words (caller decides commit)
 int awg_send_words32(const uint32_t *words32, int count)
 {
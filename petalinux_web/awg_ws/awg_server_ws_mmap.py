@@ -2,6 +2,12 @@
 import os, signal, asyncio, ctypes, socket, http
 import websockets
 
+# orjson 可選（C 實作，比標準 json 快數倍）；沒裝就用標準 json，loads 用法相同
+try:
+    import orjson as json
+except ImportError:
+    import json
+
 # uvloop 可選；若安裝不上可拿掉，不影響正確性
 try:
     import uvloop
@@ -10,6 +16,8 @@ except Exception:
     pass
 
 WS_HOST, WS_PORT, WS_PATH = "0.0.0.0", 8765, "/ws"
+# 原生 TCP 幀通道：固定 336 bytes 一幀、無 WS 封包/遮罩；不需要就設 None
+RAW_HOST, RAW_PORT = "0.0.0.0", 8767
 LIB_PATH = os.path.join(os.path.dirname(__file__), "libawg_core_mmap.so")
 
 lib = ctypes.CDLL(LIB_PATH)
@@ -17,6 +25,9 @@ lib.awg_init.restype = ctypes.c_int
 lib.awg_send_hex4.argtypes = [ctypes.c_char_p, ctypes.c_char_p,
                               ctypes.c_char_p, ctypes.c_char_p]
 lib.awg_send_hex4.restype = ctypes.c_int
+# 整幀 336 bytes 一次交給 C：bytes 以 c_char_p 傳入不複製（CDLL 呼叫期間會釋放 GIL）
+lib.awg_send_hex_frame336.argtypes = [ctypes.c_char_p]
+lib.awg_send_hex_frame336.restype = ctypes.c_int
 lib.awg_close.restype = None
 
 FRAME_LEN   = 336
@@ -44,42 +55,71 @@ async def ws_handler(ws):
         pass
 
     print("[WS] connected:", ws.remote_address)
+    send_frame336 = lib.awg_send_hex_frame336
     try:
         async for msg in ws:
-            # 二進位固定長度 336 bytes：最快路徑
-            if isinstance(msg, (bytes, bytearray)) and len(msg) == FRAME_LEN:
-                mv = memoryview(msg)
-                r = lib.awg_send_hex4(
-                    ctypes.c_char_p(mv[A_IDX_OFF:A_IDX_END].tobytes()),
-                    ctypes.c_char_p(mv[A_GAIN_OFF:A_GAIN_END].tobytes()),
-                    ctypes.c_char_p(mv[B_IDX_OFF:B_IDX_END].tobytes()),
-                    ctypes.c_char_p(mv[B_GAIN_OFF:B_GAIN_END].tobytes()),
-                )
+            # 二進位固定長度 336 bytes：最快路徑（整幀一次呼叫，不切片不複製）
+            if isinstance(msg, bytes) and len(msg) == FRAME_LEN:
+                r = send_frame336(msg)
                 if r != 0:
-                    print("[WS] awg_send_hex4 ret=", r)
+                    print("[WS] awg_send_hex_frame336 ret=", r)
                 continue
 
-            # 相容 JSON（較慢）
+            # 相容 JSON（慢速路徑，熱迴圈外處理）
             if isinstance(msg, str):
-                try:
-                    import json
-                    d = json.loads(msg)
-                    idxA  = d.get("idxA")  or d.get("idxA_hex")
-                    gainA = d.get("gainA") or d.get("gainA_hex")
-                    idxB  = d.get("idxB")  or d.get("idxB_hex")
-                    gainB = d.get("gainB") or d.get("gainB_hex")
-                    if idxA and gainA and idxB and gainB:
-                        r = lib.awg_send_hex4(idxA.encode("ascii"),
-                                              gainA.encode("ascii"),
-                                              idxB.encode("ascii"),
-                                              gainB.encode("ascii"))
-                        if r != 0:
-                            print("[WS] awg_send_hex4 ret=", r)
-                except Exception:
-                    pass
+                _apply_json(msg)
     except Exception as e:
         print("[WS] closed:", e)
 
+# JSON 各欄位的 hex 長度（C 端不檢查長度，這裡先擋掉）
+_JSON_FIELDS = (("idxA",  "idxA_hex",  A_IDX_END  - A_IDX_OFF),
+                ("gainA", "gainA_hex", A_GAIN_END - A_GAIN_OFF),
+                ("idxB",  "idxB_hex",  B_IDX_END  - B_IDX_OFF),
+                ("gainB", "gainB_hex", B_GAIN_END - B_GAIN_OFF))
+
+def _apply_json(msg):
+    """
+    JSON 相容路徑：4 個 hex 欄位檢查長度後接成一幀 336，一次 encode、一次 C 呼叫。
+    新 client 請直接送 336 bytes 二進位幀。
+    """
+    try:
+        d = json.loads(msg)
+        parts = []
+        for key, alt, n in _JSON_FIELDS:
+            v = d.get(key) or d.get(alt)
+            if not isinstance(v, str) or len(v) != n:
+                return
+            parts.append(v)
+        r = lib.awg_send_hex_frame336("".join(parts).encode("ascii"))
+        if r != 0:
+            print("[WS] awg_send_hex_frame336 ret=", r)
+    except Exception:
+        pass
+
+async def raw_handler(reader, writer):
+    # 固定長度幀：readexactly 直接切出一幀，沒有 header 解析、遮罩 XOR、opcode 分派
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+        try: sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError: pass
+
+    peer = writer.get_extra_info("peername")
+    print("[RAW] connected:", peer)
+    send_frame336 = lib.awg_send_hex_frame336
+    readexactly = reader.readexactly
+    try:
+        while True:
+            r = send_frame336(await readexactly(FRAME_LEN))
+            if r != 0:
+                print("[RAW] awg_send_hex_frame336 ret=", r)
+    except asyncio.IncompleteReadError:
+        pass
+    except Exception as e:
+        print("[RAW] closed:", e)
+    finally:
+        writer.close()
+        print("[RAW] disconnected:", peer)
+
 async def main():
     r = lib.awg_init()
     if r != 0:
@@ -96,6 +136,12 @@ async def main():
         max_queue=0,
         reuse_port=True
     ):
+        raw_server = None
+        if RAW_PORT:
+            raw_server = await asyncio.start_server(raw_handler, RAW_HOST, RAW_PORT,
+                                                    reuse_port=True)
+            print(f"[RAW] Serving on tcp://{RAW_HOST}:{RAW_PORT}  ({FRAME_LEN} bytes per frame)")
+
         stop = asyncio.Future()
         loop = asyncio.get_running_loop()
         for sig in (signal.SIGINT, signal.SIGTERM):
@@ -105,6 +151,9 @@ async def main():
                 pass
         await stop
 
+        if raw_server is not None:
+            raw_server.close()   # 不 wait_closed：3.12+ 會等仍連著的 client 斷線
+
     lib.awg_close()
     print("[WS] stopped")
 
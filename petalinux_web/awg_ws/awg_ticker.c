@@ -0,0 +1,94 @@
+// =============================================================
+// awg_ticker.c  —  Fixed-cadence frame sender for test_awg_ws_c.py
+// -------------------------------------------------------------
+// Build (shared lib):
+//   gcc -O2 -fPIC -shared -o libawg_ticker.so awg_ticker.c
+//
+// Python 端完成 WebSocket 握手、預先組好兩個完整 frame 後，把 socket fd 交給
+// awg_tick_run()：每個 period 交替送出 frame_a / frame_b，節拍用
+// clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME) 對齊絕對時間，
+// 整個迴圈不經過 Python（ctypes 呼叫期間釋放 GIL）。
+//
+// 送出用 MSG_DONTWAIT：對端跟不上、發送佇列滿時直接丟掉這一拍（*dropped++），
+// 節拍維持準時；只送出一部分的 frame 會在下一拍先補完剩下的 bytes（WS 串流不可斷）。
+//
+// 回傳：被訊號中斷（例如 Ctrl+C）回 -EINTR，send 失敗回 -errno
+// =============================================================
+
+#include <stddef.h>
+#include <time.h>
+#include <errno.h>
+#include <sys/types.h>
+#include <sys/socket.h>
+
+#define NSEC_PER_SEC 1000000000L
+
+static inline void ts_add_ns(struct timespec *t, long ns)
+{
+    t->tv_nsec += ns;
+    while (t->tv_nsec >= NSEC_PER_SEC) { t->tv_nsec -= NSEC_PER_SEC; t->tv_sec++; }
+}
+
+// a - b（ns）
+static inline long long ts_diff_ns(const struct timespec *a, const struct timespec *b)
+{
+    return (long long)(a->tv_sec - b->tv_sec) * NSEC_PER_SEC + (a->tv_nsec - b->tv_nsec);
+}
+
+// 非阻塞送出：回傳送出的 bytes（佇列滿回 0），錯誤回 -errno
+static ssize_t send_nb(int fd, const char *p, size_t len)
+{
+    ssize_t n = send(fd, p, len, MSG_NOSIGNAL | MSG_DONTWAIT);
+    if (n >= 0) return n;
+    if (errno == EAGAIN || errno == EWOULDBLOCK) return 0;
+    return -errno;
+}
+
+int awg_tick_run(int fd, const char *frame_a, const char *frame_b,
+                 size_t len, long period_ns, unsigned long *dropped)
+{
+    const char *bufs[2] = { frame_a, frame_b };
+    const char *tail = NULL;            // 上一個沒送完的 frame 剩下的部分
+    size_t tail_len = 0;
+    struct timespec next, now;
+    int i = 0;
+
+    if (fd < 0 || !frame_a || !frame_b || len == 0 || period_ns <= 0) return -EINVAL;
+
+    clock_gettime(CLOCK_MONOTONIC, &next);
+    for (;;) {
+        ssize_t n;
+        if (tail_len) {
+            // 先補完上一個 frame；還補不完就丟掉這一拍
+            if ((n = send_nb(fd, tail, tail_len)) < 0) return (int)n;
+            tail += n; tail_len -= (size_t)n;
+        }
+        if (tail_len) {
+            if (dropped) ++*dropped;
+        } else if ((n = send_nb(fd, bufs[i], len)) < 0) {
+            return (int)n;
+        } else if (n == 0) {
+            if (dropped) ++*dropped;    // 佇列滿：丟掉這一拍
+        } else if ((size_t)n < len) {
+            tail = bufs[i] + n; tail_len = len - (size_t)n;
+        }
+        i ^= 1;
+
+        ts_add_ns(&next, period_ns);
+        clock_gettime(CLOCK_MONOTONIC, &now);
+        long long late = ts_diff_ns(&now, &next);
+        if (late >= 0) {
+            // 落後整數個週期：跳到目前這一格（保持節拍相位），跳過奇數格就翻轉 i
+            // 讓 A/B 交替與時間格一致；跳完立刻送（與 Python 版一致）
+            if (late > period_ns) {
+                long long missed = late / period_ns;
+                next.tv_sec  += (time_t)((missed * period_ns) / NSEC_PER_SEC);
+                ts_add_ns(&next, (long)((missed * period_ns) % NSEC_PER_SEC));
+                if (missed & 1) i ^= 1;
+            }
+            continue;
+        }
+        int r = clock_nanosleep(CLOCK_MONOTONIC, TIMER_ABSTIME, &next, NULL);
+        if (r != 0) return -r;          // EINTR：交回 Python 處理 KeyboardInterrupt
+    }
+}
@@ -1,64 +1,337 @@
-from websocket import create_connection, ABNF
-import socket, time
+import os, socket, time, base64, hashlib, struct, ctypes, errno, asyncio, gc
 
-WS_URL = "ws://wavegenz7.local:8765/ws"   # 或用板子的 IP
+# 直接用 TCP socket + 手組 WebSocket frame（不經 websocket-client）
+WS_HOST, WS_PORT, WS_PATH = "wavegenz7.local", 8765, "/ws"   # 或用板子的 IP
+WS_GUID   = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"          # RFC 6455
+OP_BINARY = 0x2
+OP_CLOSE  = 0x8
 
 # 固定片段（18 hex）：最大增益 & 零增益（注意：零增益是 18 個 '0'）
 GAIN_MAX18  = b"00000000000001FFFF"
 GAIN_ZERO18 = b"000000000000000000"
 
+# 發送端佇列：336 B / 20 ms 的節拍流，小緩衝讓板子卡住時變成背壓，而不是在 kernel 裡堆一串再爆發送出
+SNDBUF_BYTES      = 4096
+TCP_NOTSENT_LOWAT = getattr(socket, "TCP_NOTSENT_LOWAT", 25)   # Linux
+# 未送出資料上限 = 一個 WS frame（2+2+4+336）：上一幀還卡在 kernel 沒上線前 socket 不算可寫，
+# 配合 MSG_DONTWAIT 送出，這一拍直接丟掉（dropped），送出時機跟著實際上線走，而不是在 kernel 裡排隊
+NOTSENT_LOWAT     = 344
+
+# 節拍等待：先 sleep 到截止前 SPIN_S，最後一段用 perf_counter 忙等對齊（sleep 的喚醒誤差約 ms 級）
+SPIN_S = 500e-6
+
+# 即時排程：綁在（最好是 isolcpus / nohz_full / rcu_nocbs 隔離的）核心上並用 SCHED_FIFO，
+# 減少節拍迴圈被搶佔造成的尾端抖動。迴圈會忙等，FIFO 下可能餓死同核的其他工作，
+# 所以預設關閉（與 awg_core 相同），設 AWG_REALTIME=1 才啟用，且只在節拍迴圈期間生效
+REALTIME = os.environ.get("AWG_REALTIME") == "1"
+RT_CPU  = (os.cpu_count() or 1) - 1
+RT_PRIO = 50
+
+def _enter_realtime():
+    """
+    綁核 + SCHED_FIFO；回傳原本的 affinity 供 _leave_realtime 還原（REALTIME 關閉時回 None）。
+    沒權限（非 root / 無 CAP_SYS_NICE）印出原因後照常運作。
+    """
+    if not REALTIME:
+        return None
+    try:
+        old_cpus = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, {RT_CPU})
+    except (AttributeError, OSError) as e:
+        print(f"[WARN] sched_setaffinity(cpu {RT_CPU}) failed: {e}")
+        old_cpus = None
+    try: os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(RT_PRIO))
+    except (AttributeError, OSError) as e: print(f"[WARN] SCHED_FIFO {RT_PRIO} failed: {e}")
+    return old_cpus
+
+def _leave_realtime(old_cpus):
+    """節拍迴圈結束後回到 SCHED_OTHER 與原本的 affinity"""
+    if not REALTIME:
+        return
+    try: os.sched_setscheduler(0, os.SCHED_OTHER, os.sched_param(0))
+    except (AttributeError, OSError): pass
+    if old_cpus:
+        try: os.sched_setaffinity(0, old_cpus)
+        except OSError: pass
+
+# wsaccel 可選（C 實作的 XOR 遮罩）；沒裝就用整數 XOR（整段一次，不逐 byte）
+try:
+    from wsaccel.xormask import XorMaskerSimple
+except ImportError:
+    XorMaskerSimple = None
+
+def ws_mask(mask: bytes, payload: bytes) -> bytes:
+    if XorMaskerSimple is not None:
+        return XorMaskerSimple(mask).process(payload)
+    n = len(payload)
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(n, "big")
+
+# True：每 2 個週期送一次，一次 write 帶兩個 WS frame（1k + 20k，共 688 bytes）
+# 送出次數減半；代價是兩幀在板子上會背靠背套用（節拍解析度變成 2×period）。
+# server 端每個 WS 訊息仍是固定 336 bytes，不需改動。
+PAIR_MODE = False
+
+# True：用 asyncio 事件迴圈的計時器（loop.call_at 絕對時間）排程每一拍，取代 sleep + 忙等
+USE_ASYNCIO = False
+
+# C 節拍器（可選）：awg_ticker.c 編成 libawg_ticker.so 放同目錄就用它送；沒有就走 Python 迴圈
+TICKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "libawg_ticker.so")
+
+def _load_ticker():
+    try:
+        lib = ctypes.CDLL(TICKER_PATH)
+    except OSError:
+        return None
+    lib.awg_tick_run.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_char_p,
+                                 ctypes.c_size_t, ctypes.c_long,
+                                 ctypes.POINTER(ctypes.c_ulong)]
+    lib.awg_tick_run.restype = ctypes.c_int
+    return lib
+
+_ticker = _load_ticker()
+
+# tone0 以外的固定片段：idx tone1..7（21 hex）、gain tone0 最大 + tone1..7 為零（144 hex）
+IDX_TAIL = b"000" * 7
+GAIN144  = GAIN_MAX18 + (GAIN_ZERO18 * 7)
+
 def build_frame(idx_val: int) -> bytes:
     """
     組一個 336 bytes 的 frame：
       idxA(24) + gainA(144) + idxB(24) + gainB(144)
     只開 tone0，其餘 tone 都 0。
     """
-    idx0  = f"{idx_val:03X}".encode("ascii")           # 3 hex
-    idx24 = idx0 + (b"000" * 7)                        # 3*8 = 24
-
-    gain144 = GAIN_MAX18 + (GAIN_ZERO18 * 7)           # 18*8 = 144
+    idx0  = b"%03X" % (idx_val & 0xFFF)                # 3 hex
+    idx24 = idx0 + IDX_TAIL                            # 3*8 = 24
 
-    frame = idx24 + gain144 + idx24 + gain144
+    # 一次 join 配置最終 336 bytes（不產生中間串接結果）
+    frame = b"".join((idx24, GAIN144, idx24, GAIN144))
     assert len(frame) == 336
     return frame
 
+def ws_frame(payload: bytes, opcode: int = OP_BINARY) -> bytes:
+    """
+    組一個完整的 client → server WebSocket frame（FIN=1、必須加 mask）：
+      byte0 = 0x80|opcode, byte1 = 0x80|len（126 → 後接 16-bit 長度）, 4-byte mask, 已遮罩 payload
+    336 bytes payload → 2 + 2 + 4 + 336 = 344 bytes
+    """
+    n = len(payload)
+    if n < 126:
+        hdr = struct.pack(">BB", 0x80 | opcode, 0x80 | n)
+    elif n < 65536:
+        hdr = struct.pack(">BBH", 0x80 | opcode, 0x80 | 126, n)
+    else:
+        hdr = struct.pack(">BBQ", 0x80 | opcode, 0x80 | 127, n)
+    mask = os.urandom(4)
+    masked = ws_mask(mask, payload)
+    return hdr + mask + masked
+
+def ws_handshake(sock: socket.socket, host: str, port: int, path: str):
+    """送 HTTP Upgrade，讀到空行為止，確認 101 與 Sec-WebSocket-Accept"""
+    key = base64.b64encode(os.urandom(16))
+    req = (f"GET {path} HTTP/1.1\r\n"
+           f"Host: {host}:{port}\r\n"
+           "Upgrade: websocket\r\n"
+           "Connection: Upgrade\r\n"
+           f"Sec-WebSocket-Key: {key.decode('ascii')}\r\n"
+           "Sec-WebSocket-Version: 13\r\n"
+           "\r\n").encode("ascii")
+    sock.sendall(req)
+
+    resp = b""
+    while b"\r\n\r\n" not in resp:
+        chunk = sock.recv(1024)
+        if not chunk:
+            raise ConnectionError("handshake: connection closed")
+        resp += chunk
+    head = resp.split(b"\r\n\r\n", 1)[0].decode("latin-1")
+    lines = head.split("\r\n")
+    if " 101 " not in lines[0] + " ":
+        raise ConnectionError(f"handshake failed: {lines[0]}")
+    accept = base64.b64encode(hashlib.sha1(key + WS_GUID).digest()).decode("ascii")
+    hdrs = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:])}
+    if hdrs.get("sec-websocket-accept") != accept:
+        raise ConnectionError("handshake: bad Sec-WebSocket-Accept")
+
 def connect():
-    ws = create_connection(WS_URL)
+    sock = socket.create_connection((WS_HOST, WS_PORT))
     # 關 Nagle，減少聚包
-    ws.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
-    # 視情況調小發送緩衝區，降低批次累積（可選）
-    # ws.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    # 調小發送緩衝區，降低批次累積
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SNDBUF_BYTES)
+    # 以下為 Linux 專用：立即回 ACK（避開 delayed ACK），並限制尚未送出的資料量
+    try: sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+    except (AttributeError, OSError): pass
+    try: sock.setsockopt(socket.IPPROTO_TCP, TCP_NOTSENT_LOWAT, NOTSENT_LOWAT)
+    except OSError: pass
+    ws_handshake(sock, WS_HOST, WS_PORT, WS_PATH)
+    # 純送端：沒有 ping/keepalive 計時器、沒有背景讀取 thread，也不做 UTF-8 驗證（只送 binary）；
+    # server 送來的 ping 不會被讀取回應，server 端需關閉 ping 逾時（websockets: ping_interval=None）
     print("[DEBUG] Connected!")
-    return ws
+    return sock
+
+def close(sock: socket.socket):
+    # 正常關閉：close frame（1000 = normal closure）後關 socket
+    try:
+        sock.sendall(ws_frame(struct.pack(">H", 1000), OP_CLOSE))
+    except OSError:
+        pass
+    sock.close()
+
+def run_c(sock, raw_frames, period_s, stats):
+    # 整個節拍迴圈交給 C（clock_nanosleep 絕對時間 + send）；Ctrl+C 時回 -EINTR
+    a, b = raw_frames
+    c_dropped = ctypes.c_ulong(0)
+    try:
+        while True:
+            r = _ticker.awg_tick_run(sock.fileno(), a, b, len(a), int(period_s * 1e9),
+                                     ctypes.byref(c_dropped))
+            if r != -errno.EINTR:
+                raise OSError(-r, os.strerror(-r))
+    finally:
+        stats["dropped"] += c_dropped.value
+
+def run(sock, raw_frames, period_s, stats):
+    """
+    Python 節拍迴圈。放在函式裡、迴圈用到的名字先綁成區域變數：
+    每拍只有 LOAD_FAST，沒有 global / 屬性查找。
+    """
+    perf    = time.perf_counter
+    sleep   = time.sleep
+    spin_s  = SPIN_S
+    # 非阻塞送出：板子跟不上（發送佇列滿）就丟掉這一拍，節拍不被 send 卡住
+    send    = sock.send
+    DONT    = socket.MSG_DONTWAIT
+    tail    = b""                    # 上一個只送出一部分的 frame 剩下的 bytes（WS 串流不可斷）
+    next_t  = perf()
+    i       = 0
+
+    while True:
+        try:
+            if tail:
+                tail = tail[send(tail, DONT):]
+            if tail:
+                stats["dropped"] += 1
+            else:
+                f = raw_frames[i]
+                n = send(f, DONT)
+                if n < len(f):
+                    tail = f[n:]
+        except BlockingIOError:
+            stats["dropped"] += 1
+
+        i ^= 1
+        next_t += period_s
+        # 節拍睡眠，避免抖動累積
+        dt = next_t - perf()
+        if dt > 0:
+            if dt > spin_s:
+                sleep(dt - spin_s)
+            while perf() < next_t:
+                pass
+        elif dt < -period_s:
+            # 落後整數個週期：跳到目前這一格（仍對齊原本的節拍相位），
+            # 跳過奇數格就翻轉 i，A/B 交替與時間格保持一致；跳完立刻送
+            missed = int(-dt // period_s)
+            next_t += missed * period_s
+            if missed & 1:
+                i ^= 1
+
+async def run_async(sock, raw_frames, period_s, stats):
+    """
+    asyncio 版節拍：每一拍由 loop.call_at(next_t) 觸發（事件迴圈的 monotonic 計時器），
+    callback 內直接非阻塞送出，再排下一拍；不需要另開 thread 或 task。
+    """
+    loop    = asyncio.get_running_loop()
+    send    = sock.send
+    DONT    = socket.MSG_DONTWAIT
+    state   = {"i": 0, "tail": b"", "next_t": loop.time()}
+    done    = loop.create_future()
+
+    def tick():
+        i, tail = state["i"], state["tail"]
+        try:
+            if tail:
+                tail = tail[send(tail, DONT):]
+            if tail:
+                stats["dropped"] += 1
+            else:
+                f = raw_frames[i]
+                n = send(f, DONT)
+                if n < len(f):
+                    tail = f[n:]
+        except BlockingIOError:
+            stats["dropped"] += 1
+        except OSError as e:
+            if not done.done(): done.set_exception(e)
+            return
+
+        i ^= 1
+        next_t = state["next_t"] + period_s
+        late = loop.time() - next_t
+        if late > period_s:
+            # 與同步版相同：跳過整數個週期、保持相位與 A/B 奇偶
+            missed = int(late // period_s)
+            next_t += missed * period_s
+            if missed & 1:
+                i ^= 1
+        state["i"], state["tail"], state["next_t"] = i, tail, next_t
+        loop.call_at(next_t, tick)
+
+    loop.call_at(state["next_t"], tick)
+    await done
 
 if __name__ == "__main__":
-    ws = None
+    sock  = None
+    stats = {"dropped": 0}
+    old_cpus = None
     try:
-        ws = connect()
+        sock = connect()
 
         frame_1k  = build_frame(0x001)   # 1 kHz 的 index
         frame_20k = build_frame(0x020)   # 20 kHz 的 index（你之前寫 30 是 0x01E，確認用 0x020）
+        # 兩個 frame 放進 tuple，迴圈內用索引 i ^= 1 交替（不必每拍做條件判斷）
+        frames = (frame_1k, frame_20k)
+        # payload 固定 → 整個 WS frame（header + mask + 已遮罩 payload）啟動時各組一次，
+        # 迴圈內直接送出原始 bytes，省掉每拍的 framing / masking / 配置。
+        # 每個 frame 的 mask key 固定（啟動時隨機取一次）；server 不會檢查 mask 是否每次不同
+        raw_frames = tuple(ws_frame(f) for f in frames)
 
         period_s = 0.020   # 每 2 ms 切換一次，可自己調（用節拍法更穩定）
-        next_t   = time.perf_counter()
-        toggle   = False
 
-        while True:
-            payload = frame_1k if not toggle else frame_20k
-            ws.send(payload, opcode=ABNF.OPCODE_BINARY)
-
-            toggle = not toggle
-            next_t += period_s
-            # 節拍睡眠，避免抖動累積
-            dt = next_t - time.perf_counter()
-            if dt > 0:
-                time.sleep(dt)
-            else:
-                # 若落後太多，立刻追上節拍
-                next_t = time.perf_counter()
+        if PAIR_MODE:
+            pair       = b"".join(raw_frames)
+            raw_frames = (pair, pair)      # 各送出迴圈照常交替，兩格內容相同
+            period_s  *= 2
+
+        # 進入穩態前清一次垃圾、把啟動期物件移出世代掃描，節拍迴圈期間關掉循環 GC：
+        # 迴圈幾乎不配置物件，避免 gen-2 回收（ms 級停頓）吃掉某一拍
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+        # 即時排程只包住節拍迴圈（連線 / 組幀 / 關閉都在一般排程下做）
+        old_cpus = _enter_realtime()
+
+        if USE_ASYNCIO:
+            # uvloop 可選（libuv 事件迴圈，計時器較準、每次喚醒的 syscall 較少）；沒裝就用內建迴圈
+            try:
+                import uvloop
+                uvloop.install()
+                print("[DEBUG] Using asyncio call_at scheduler (uvloop)")
+            except ImportError:
+                print("[DEBUG] Using asyncio call_at scheduler")
+            asyncio.run(run_async(sock, raw_frames, period_s, stats))
+        elif _ticker is not None:
+            print("[DEBUG] Using C ticker")
+            run_c(sock, raw_frames, period_s, stats)
+        else:
+            run(sock, raw_frames, period_s, stats)
     except KeyboardInterrupt:
         print("[INFO] Stopped by user")
     finally:
-        if ws:
-            ws.close()
+        _leave_realtime(old_cpus)
+        gc.enable()
+        print(f"[INFO] dropped frames: {stats['dropped']}")
+        if sock:
+            close(sock)
             print("[DEBUG] Closed connection")
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import time
+import os, time, struct, fcntl, ctypes
 import gpiod
 from gpiod.line import Direction, Value
 from gpiod import LineSettings
@@ -12,30 +12,101 @@ DEF_WEN_OFF   = 0
 DEF_WEN_ACTHI = True
 DEF_WEN_US    = 1  # 建議 0 或 1；若只看邊緣可 0
 
-# 全域 GPIO handle（程序存活期間重用）
+# 即時排程：WEN 脈衝只有 us 級寬度，預設 SCHED_OTHER 下被搶佔就是數百 us 抖動
+# 預設關閉（整個 server 拿 SCHED_FIFO 可能餓死其他工作）；設環境變數 AWG_REALTIME=1 才啟用
+REALTIME = os.environ.get("AWG_REALTIME") == "1"
+RT_CPU  = (os.cpu_count() or 1) - 1   # 綁最後一顆核心（建議開機參數 isolcpus=<RT_CPU>）
+RT_PRIO = 80                          # SCHED_FIFO 優先權
+_MCL_CURRENT, _MCL_FUTURE = 1, 2
+
+def enter_realtime():
+    """
+    由送出迴圈的進入點（該 thread 內）明確呼叫，import 時不做。
+    綁核 + SCHED_FIFO 只作用在呼叫端 thread；mlockall 作用於整個 process。
+    REALTIME 為 False 時不動作；沒權限（非 root / 無 CAP_SYS_NICE）印出原因後照常運作。
+    """
+    if not REALTIME:
+        return
+    try: os.sched_setaffinity(0, {RT_CPU})
+    except (AttributeError, OSError) as e: print(f"[AWG] sched_setaffinity(cpu {RT_CPU}) failed: {e}")
+    try: os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(RT_PRIO))
+    except (AttributeError, OSError) as e: print(f"[AWG] SCHED_FIFO {RT_PRIO} failed: {e}")
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.mlockall(_MCL_CURRENT | _MCL_FUTURE) != 0:   # 避免 bit-bang 途中 page fault
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+    except (AttributeError, OSError) as e: print(f"[AWG] mlockall failed: {e}")
+
+# C 快速路徑（可選）：awg_libgpiod/awg_core_libgpiod.c 編成的 libawg_core_libgpiod.so
+# 放在本檔同目錄就會載入；整張表一次 ctypes 呼叫，逐 word 的 set + WEN 脈衝都在 C 裡做
+LIB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "libawg_core_libgpiod.so")
+
+def _load_lib():
+    try:
+        lib = ctypes.CDLL(LIB_PATH)
+    except OSError:
+        return None
+    lib.awg_init.restype = ctypes.c_int
+    lib.awg_send_words32_pulse.argtypes = [ctypes.POINTER(ctypes.c_uint32), ctypes.c_int,
+                                           ctypes.c_int, ctypes.c_uint]
+    lib.awg_send_words32_pulse.restype = ctypes.c_int
+    lib.awg_close.restype = None
+    if lib.awg_init() != 0:
+        lib.awg_close()
+        return None
+    return lib
+
+_lib = _load_lib()
+
+# 全域 GPIO handle（程序存活期間重用）；C 路徑已持有同一組線，Python 端就不再 request
 _cfg_out = LineSettings(direction=Direction.OUTPUT, output_value=Value.INACTIVE)
-_data_req = gpiod.request_lines(
-    DEF_DATA_CHIP, consumer="awg_data", config={i: _cfg_out for i in range(32)}
-)
-_wen_req = gpiod.request_lines(
-    DEF_WEN_CHIP, consumer="awg_wen", config={DEF_WEN_OFF: _cfg_out}
-)
+if _lib is None:
+    _data_req = gpiod.request_lines(
+        DEF_DATA_CHIP, consumer="awg_data", config={i: _cfg_out for i in range(32)}
+    )
+    _wen_req = gpiod.request_lines(
+        DEF_WEN_CHIP, consumer="awg_wen", config={DEF_WEN_OFF: _cfg_out}
+    )
+else:
+    _data_req = _wen_req = None
+
+# DATA 快速路徑：直接對 line-request fd 下 GPIO_V2_LINE_SET_VALUES_IOCTL
+#   struct gpio_v2_line_values { u64 bits; u64 mask; }，bit i = request 內第 i 條線（即 offset i）
+#   一個 word = 一次 ioctl，省掉 binding 每次把 dict 轉成 offsets/values 陣列的成本
+_GPIO_V2_LINE_SET_VALUES_IOCTL = 0xC010B40F   # _IOWR(0xB4, 0x0F, 16 bytes)
+_LINE_VALUES = struct.Struct("=QQ")
+_DATA_MASK   = 0xFFFFFFFF
+_data_fd = getattr(_data_req, "fd", None)     # 舊版 binding 沒有 fd → 走 set_values
+
+# 後備路徑：常數表拆位成 {offset: Value}
+_ACTIVE, _INACTIVE = Value.ACTIVE, Value.INACTIVE
+_BITS = [(i, 1 << i) for i in range(32)]
+
+# word -> 已備好的 payload（ioctl 的 16-byte 結構或 {offset: Value}）
+# 實際會出現的 word 很少（每表 33 個、idx/gain 多半重複），第二次起只剩一次 dict.get
+_WORD_CACHE_MAX = 1024
+_word_cache = {}
 
 def pack_sel(ch, tone): return ((ch & 1) << 27) | ((tone & 7) << 24)
 def make_index_word(ch, tone, idx20): return (0x1<<28) | pack_sel(ch,tone) | (idx20 & 0xFFFFF)
 def make_gain_word(ch, tone, g20):    return (0x2<<28) | pack_sel(ch,tone) | (g20 & 0xFFFFF)
 def make_commit_word():               return (0xF<<28)
 
+# 每個 (cmd, ch, tone) 的 header 固定，預先算好；build_words 只剩 OR payload
+_HDR_IDX_A  = [make_index_word(0,t,0) for t in range(8)]
+_HDR_GAIN_A = [make_gain_word(0,t,0)  for t in range(8)]
+_HDR_IDX_B  = [make_index_word(1,t,0) for t in range(8)]
+_HDR_GAIN_B = [make_gain_word(1,t,0)  for t in range(8)]
+
 def to_int_list(s, n=8, default=0):
-    out=[]; 
+    # 逐 token 轉換：格式不對（'1.5'、'12abc'、'-0x10'）直接丟 ValueError，不猜
+    vals=[]
     if s:
         for tok in s.split(','):
             tok=tok.strip()
-            if tok:
-                base=16 if tok.lower().startswith('0x') else 10
-                out.append(int(tok, base))
-    while len(out)<n: out.append(default)
-    return out[:n]
+            if tok: vals.append(int(tok, 16 if tok[:2].lower()=='0x' else 10))
+    if len(vals) < n: vals += [default] * (n - len(vals))
+    return vals[:n]
 
 def to_float_list(s, n=8, default=0.0):
     out=[]
@@ -47,9 +118,13 @@ def to_float_list(s, n=8, default=0.0):
     return out[:n]
 
 def gain_f_to_q17(f):
-    if f<0: f=0.0
-    if f>1: f=1.0
-    return int(f*0x1FFFF + 0.5)
+    # 先把 float 夾在 [0, 1] 再換算（±inf 也不會溢位）
+    return int((0.0 if f < 0.0 else 1.0 if f > 1.0 else f)*0x1FFFF + 0.5)
+
+def gains_f_to_q17(fs):
+    # 整組一次換算：夾值 / 換算 / 四捨五入在同一個 comprehension 內完成（與 gain_f_to_q17 同一式子），
+    # 不逐一呼叫函式
+    return [int((0.0 if f < 0.0 else 1.0 if f > 1.0 else f)*0x1FFFF + 0.5) for f in fs]
 
 def _wen_edge(active_high=True, pulse_us=DEF_WEN_US):
     on  = Value.ACTIVE if active_high else Value.INACTIVE
@@ -60,20 +135,46 @@ def _wen_edge(active_high=True, pulse_us=DEF_WEN_US):
         while time.monotonic_ns() < target: pass
     _wen_req.set_values({DEF_WEN_OFF: off})
 
+def _word_payload(word:int):
+    if _data_fd is not None:
+        p = _LINE_VALUES.pack(word & _DATA_MASK, _DATA_MASK)
+    else:
+        p = {i: (_ACTIVE if (word & b) else _INACTIVE) for i, b in _BITS}
+    if len(_word_cache) >= _WORD_CACHE_MAX: _word_cache.clear()
+    _word_cache[word] = p
+    return p
+
 def _write_word(word:int):
-    _data_req.set_values({i: (Value.ACTIVE if ((word>>i)&1) else Value.INACTIVE) for i in range(32)})
+    p = _word_cache.get(word)
+    if p is None: p = _word_payload(word)
+    if _data_fd is not None:
+        fcntl.ioctl(_data_fd, _GPIO_V2_LINE_SET_VALUES_IOCTL, p)
+    else:
+        _data_req.set_values(p)
 
 def build_words(idxA, gainA, idxB, gainB):
-    words=[]
-    for t in range(8): words.append(make_index_word(0,t,idxA[t]))
-    for t in range(8): words.append(make_gain_word(0,t,gainA[t]))
-    for t in range(8): words.append(make_index_word(1,t,idxB[t]))
-    for t in range(8): words.append(make_gain_word(1,t,gainB[t]))
-    return words
+    return ([h | (v & 0xFFFFF) for h, v in zip(_HDR_IDX_A,  idxA)] +
+            [h | (v & 0xFFFFF) for h, v in zip(_HDR_GAIN_A, gainA)] +
+            [h | (v & 0xFFFFF) for h, v in zip(_HDR_IDX_B,  idxB)] +
+            [h | (v & 0xFFFFF) for h, v in zip(_HDR_GAIN_B, gainB)])
+
+# C 端脈寬是 unsigned ns（32-bit），超過就會繞回；兩條路徑都以同一個上限檢查
+_PULSE_US_MAX = 0xFFFFFFFF // 1_000
 
 def send_words(words, do_commit=True, wen_active_high=DEF_WEN_ACTHI, pulse_us=DEF_WEN_US):
+    # 負值 = 不等（與 _wen_edge 的 pulse_us<=0 一致），過大直接拒絕
+    pulse_us = max(0, int(pulse_us))
+    if pulse_us > _PULSE_US_MAX:
+        raise ValueError(f"pulse_us {pulse_us} > {_PULSE_US_MAX}")
+    n = len(words) + (1 if do_commit else 0)
+    if _lib is not None and n:
+        buf = (ctypes.c_uint32 * n)(*words)
+        if do_commit: buf[n-1] = make_commit_word()
+        r = _lib.awg_send_words32_pulse(buf, n, 1 if wen_active_high else 0, pulse_us*1_000)
+        if r != 0: raise RuntimeError(f"awg_send_words32_pulse failed: {r}")
+        return n
     for w in words:
         _write_word(w); _wen_edge(wen_active_high, pulse_us)
     if do_commit:
         _write_word(make_commit_word()); _wen_edge(wen_active_high, pulse_us)
-    return len(words) + (1 if do_commit else 0)
\ No newline at end of file
+    return n
\ No newline at end of file
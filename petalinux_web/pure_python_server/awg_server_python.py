@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import os
-import json
 import threading
 import asyncio
 from flask import Flask, request, send_from_directory, Response
 
+# orjson 可選（C 實作，loads 比標準 json 快數倍）；沒裝就用標準 json，用法相同
+try:
+    import orjson as json
+except ImportError:
+    import json
+
 import awg_core as core
 
 # -------------------------------
@@ -60,6 +65,15 @@ def normalize_list(val, n, default=0, cast=int):
         out = out[:n]
     return out
 
+def _int_list8(val, default):
+    """
+    快速路徑：JSON 已是 8 個 int 的 list 就直接用（不複製、不逐一轉型）；
+    其餘（字串、長度不符、含非 int）才走 normalize_list。
+    """
+    if type(val) is list and len(val) == 8 and all(type(x) is int for x in val):
+        return val
+    return normalize_list(val, 8, default, int)
+
 def _apply_payload(payload):
     """
     將解析好的 dict 套用到 AWG（不回傳任何資料）。
@@ -70,19 +84,19 @@ def _apply_payload(payload):
     pulse_us  = int(payload.get("wen_pulse_us", core.DEF_WEN_US) or core.DEF_WEN_US)
 
     # index/gain（支援 *_f 與整數 Q1.17）
-    idxA = normalize_list(payload.get("idxA"), 8, 0, int)
-    idxB = normalize_list(payload.get("idxB"), 8, 8, int)
+    idxA = _int_list8(payload.get("idxA"), 0)
+    idxB = _int_list8(payload.get("idxB"), 8)
 
     if ("gainA_f" in payload) or ("gainB_f" in payload):
         gA_f = normalize_list(payload.get("gainA_f"), 8, 0.0, float)
         gB_f = normalize_list(payload.get("gainB_f"), 8, 0.0, float)
-        gainA = [core.gain_f_to_q17(x) for x in gA_f]
-        gainB = [core.gain_f_to_q17(x) for x in gB_f]
+        gainA = core.gains_f_to_q17(gA_f)
+        gainB = core.gains_f_to_q17(gB_f)
     else:
-        gainA = normalize_list(payload.get("gainA"), 8, 0, int)
-        gainB = normalize_list(payload.get("gainB"), 8, 0, int)
+        gainA = _int_list8(payload.get("gainA"), 0)
+        gainB = _int_list8(payload.get("gainB"), 0)
 
-    # 打包與送出（內部使用已常駐的 GPIO handle）
+    # 打包與送出（內部使用已常駐的 GPIO handle；有 C 函式庫時整張 33 words 一次 ctypes 呼叫）
     words = core.build_words(idxA, gainA, idxB, gainB)
     core.send_words(words, do_commit=True, wen_active_high=wen_acthi, pulse_us=pulse_us)
 
@@ -124,8 +138,10 @@ WS_PORT   = 8765
 WS_PATH   = "/ws"
 
 def _run_ws_server():
+    # 送出路徑在這個 thread：只有它進即時排程（AWG_REALTIME=1 時），Flask 主 thread 不受影響
+    core.enter_realtime()
+
     import http
-    import json
     import websockets
     from websockets.exceptions import ConnectionClosedOK, ConnectionClosedError
 
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Long-running LED daemon for led_toggle.py
+# Holds the libgpiod v2 line requests for the RGB LEDs, so a toggle is one
+# set_values() per LED instead of request + set + release per CGI hit.
+#
+# Protocol (Unix stream socket, LED_SOCK in led_toggle.py), one line per request:
+#   "<chip> <off>=<bit>,<off>=<bit>...\n"   e.g. "/dev/gpiochip2 2=1,1=0,0=0\n"
+# Reply: "OK\n" or "ERR <reason>\n"
+#
+# Only ALLOWED_CHIPS and the six LED offsets are accepted; each LED's three lines are
+# requested the first time that LED is toggled (other lines on the chip stay free).
+# The socket is 0660 owned by SOCK_GROUP (the group the CGI runs as).
+#
+# Run as a user that may open the gpiochip (e.g. root at boot):
+#   python3 led_daemon.py &
+
+import os, grp, socket
+
+import gpiod
+from gpiod.line import Direction, Value
+
+from led_toggle import LED0_OFFSETS, LED1_OFFSETS, LED_SOCK, DEFAULT_CHIP
+
+ALLOWED_CHIPS = (DEFAULT_CHIP,)
+LED_GROUPS    = (LED0_OFFSETS, LED1_OFFSETS)
+SOCK_MODE     = 0o660
+SOCK_GROUP    = "www-data"         # CGI 執行的群組；找不到就只留 root 可用（CGI 會退回直接 request）
+
+_reqs = {}                         # (chip path, LED offsets) -> 常駐 LineRequest（每顆 LED 3 條線）
+
+def get_request(chip_path, offsets):
+    key = (chip_path, offsets)
+    req = _reqs.get(key)
+    if req is None:
+        cfg = gpiod.LineSettings(direction=Direction.OUTPUT,
+                                 output_value=Value.INACTIVE)
+        req = gpiod.request_lines(chip_path,
+                                  consumer="web_led_toggle",
+                                  config={off: cfg for off in offsets})
+        _reqs[key] = req
+    return req
+
+def parse_line(line):
+    """'<chip> <off>=<bit>,...' -> (chip, {offset: Value})"""
+    chip, _, pairs = line.strip().partition(" ")
+    if chip not in ALLOWED_CHIPS:
+        raise ValueError(f"chip {chip!r} not allowed")
+    valmap = {}
+    for item in pairs.split(","):
+        off, _, bit = item.partition("=")
+        off = int(off)
+        if not any(off in g for g in LED_GROUPS):
+            raise ValueError(f"offset {off} not an LED line")
+        valmap[off] = Value.ACTIVE if bit.strip() == "1" else Value.INACTIVE
+    if not valmap:
+        raise ValueError("empty request")
+    return chip, valmap
+
+def apply(chip, valmap):
+    # 依 LED 分組送出：每顆 LED 一次 set_values
+    for offsets in LED_GROUPS:
+        part = {off: v for off, v in valmap.items() if off in offsets}
+        if part:
+            get_request(chip, offsets).set_values(part)
+
+def handle(conn):
+    with conn:
+        conn.settimeout(1.0)
+        try:
+            line = conn.makefile("rb").readline().decode("ascii")
+            chip, valmap = parse_line(line)
+            apply(chip, valmap)
+            reply = "OK\n"
+        except Exception as e:
+            reply = f"ERR {e}\n"
+        try:
+            conn.sendall(reply.encode("ascii", "replace"))
+        except OSError:
+            pass
+
+def main():
+    try:
+        os.unlink(LED_SOCK)
+    except FileNotFoundError:
+        pass
+
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)    # bind 建出的 socket 先只有 owner 可用，再放給 SOCK_GROUP
+    try:
+        srv.bind(LED_SOCK)
+    finally:
+        os.umask(old_umask)
+    os.chmod(LED_SOCK, SOCK_MODE)
+    try:
+        os.chown(LED_SOCK, -1, grp.getgrnam(SOCK_GROUP).gr_gid)
+    except (KeyError, OSError) as e:
+        print(f"[LED] cannot give {LED_SOCK} to group {SOCK_GROUP}: {e}")
+    srv.listen(8)
+    print(f"[LED] listening on {LED_SOCK}")
+
+    try:
+        while True:
+            conn, _ = srv.accept()
+            handle(conn)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.close()
+        try:
+            os.unlink(LED_SOCK)
+        except OSError:
+            pass
+        for req in _reqs.values():
+            req.release()
+        print("[LED] stopped")
+
+if __name__ == "__main__":
+    main()
@@ -12,17 +12,20 @@
 #   r,g,b      -> apply to LED0 (r0,g0,b0)
 #
 # Return: JSON object with what was applied or error message.
+#
+# If led_daemon.py is running and chip is the default, the values are handed to it
+# over a Unix socket (it holds the line request, so each toggle is a single
+# set_values). Otherwise the lines are requested, set and released here, as before.
 
-import os, sys, json
+import os, sys, json, socket
 from urllib.parse import parse_qs
 
-import gpiod
-from gpiod.line import Direction, Value
-
 # ---- configuration: change if你走線不同 ----
 LED0_OFFSETS = (2, 1, 0)          # R0,G0,B0
 LED1_OFFSETS = (5, 4, 3)          # R1,G1,B1
 DEFAULT_CHIP = "/dev/gpiochip2"
+LED_SOCK     = "/run/led_toggle.sock"   # led_daemon.py listens here
+SOCK_TIMEOUT = 0.5
 
 def _read_form():
     """Read urlencoded body for POST or query for GET, return dict[str, str]."""
@@ -89,11 +92,45 @@ def _build_targets(form):
 
     return chip, targets, detail
 
+def encode_targets(chip_path, targets):
+    """Daemon request line: '<chip> <off>=<bit>,<off>=<bit>...\\n'."""
+    pairs = ",".join(f"{off}={bit}" for off, bit in targets.items())
+    return f"{chip_path} {pairs}\n".encode("ascii")
+
+def _apply_via_daemon(chip_path, targets):
+    """
+    Send targets to led_daemon.py. Returns False if no daemon is reachable
+    (caller falls back to a direct request); raises if the daemon reports an error.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(SOCK_TIMEOUT)
+            s.connect(LED_SOCK)
+            s.sendall(encode_targets(chip_path, targets))
+            reply = s.makefile("rb").readline().decode("ascii", "replace").strip()
+    except OSError:
+        return False
+    if reply != "OK":
+        raise RuntimeError(f"led_daemon: {reply or 'no reply'}")
+    return True
+
 def _apply(chip_path, targets):
+    """
+    Drive 'targets' ({offset:int0/1}): through led_daemon.py when it is running,
+    otherwise by requesting the lines here. The daemon only serves DEFAULT_CHIP,
+    so any other chip always takes the direct path.
+    """
+    if chip_path != DEFAULT_CHIP or not _apply_via_daemon(chip_path, targets):
+        _apply_direct(chip_path, targets)
+
+def _apply_direct(chip_path, targets):
     """
     Use libgpiod v2 to request lines as OUTPUT and set values in one shot.
     'targets' is {offset:int0/1}
     """
+    import gpiod
+    from gpiod.line import Direction, Value
+
     # Build line settings (all as OUTPUT, default INACTIVE)
     cfg = gpiod.LineSettings(direction=Direction.OUTPUT,
                              output_value=Value.INACTIVE)